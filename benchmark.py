@@ -0,0 +1,152 @@
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import tempfile
+
+# Drive the app without a window; this has to happen before main initializes pygame
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+import main
+
+DEFAULT_SIZES = [0, 100, 1000, 10000, 100000]
+
+# Function to build a reproducible session with every wound type and size
+def synthetic_wounds(count, width, height, seed=2077):
+    rng = random.Random(seed)
+    wound_types = list(main.WOUND_TYPES)
+    sizes = list(range(main.MIN_WOUND_SIZE, main.MAX_WOUND_SIZE + 1, main.WOUND_SIZE_STEP))
+    return main.WoundStore((rng.choice(wound_types), rng.randrange(width), rng.randrange(height), rng.choice(sizes))
+                           for _ in range(count))
+
+# Function to summarize timings (in seconds) as millisecond percentiles
+def summarize(samples):
+    ordered = sorted(samples)
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000
+    return {
+        "count": len(ordered),
+        "mean": sum(ordered) / len(ordered) * 1000,
+        "p50": percentile(50),
+        "p90": percentile(90),
+        "p99": percentile(99),
+        "max": ordered[-1] * 1000
+    }
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+def bench_size(app, count, frames, repeats, workdir):
+    rng = random.Random(count)
+    wounds = synthetic_wounds(count, app.diagram_width, main.SCREEN_HEIGHT)
+    results = {}
+
+    # Loading: parse the file on disk and swap the session into the app
+    for extension in (".json", main.BINARY_EXTENSION):
+        path = os.path.join(workdir, "bench" + extension)
+        main.write_session(path, app.current_diagram, wounds)
+        samples = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            diagram, loaded, _ = main.read_session(path)
+            app.apply_loaded(diagram, loaded)
+            samples.append(time.perf_counter() - start)
+        results["load" + extension.replace(".", "_")] = summarize(samples)
+
+    # Saving: what a SAVE click hands to the I/O worker
+    for extension in (".json", main.BINARY_EXTENSION):
+        path = os.path.join(workdir, "bench_save" + extension)
+        samples = [timed(main.write_session, path, app.current_diagram, app.wounds.copy()) for _ in range(repeats)]
+        results["save" + extension.replace(".", "_")] = summarize(samples)
+
+    # Frames: a full redraw, and the steady state where only the scan line moves
+    samples = [timed(app.draw_cyberpunk_ui) for _ in range(frames)]
+    results["frame_full"] = summarize(samples)
+    app.mark_dirty()
+    app.render_frame()
+    samples = []
+    for _ in range(frames):
+        # Force the scan line to move every frame
+        app.scan_y = (app.scan_y + 1) % main.SCREEN_HEIGHT if app.scan_y is not None else None
+        samples.append(timed(app.render_frame))
+    results["frame_idle"] = summarize(samples)
+
+    # Erase clicks at random points on the diagram
+    points = [(rng.randrange(app.diagram_width), rng.randrange(main.SCREEN_HEIGHT)) for _ in range(frames)]
+    app.erase_mode = True
+    results["erase_click"] = summarize([timed(app.click_diagram, point) for point in points])
+    app.erase_mode = False
+    return results
+
+# Function to compare results against a baseline run, returning the regressions
+def compare(results, baseline, threshold):
+    regressions = []
+    print(f"{'size':>8} {'metric':<16} {'p50 ms':>10} {'baseline':>10} {'ratio':>7}")
+    for size, metrics in results.items():
+        for metric, summary in metrics.items():
+            base = baseline.get(size, {}).get(metric)
+            if not base:
+                continue
+            ratio = summary["p50"] / base["p50"] if base["p50"] else 1.0
+            flag = ""
+            if ratio > threshold:
+                flag = "  REGRESSION"
+                regressions.append((size, metric, ratio))
+            print(f"{size:>8} {metric:<16} {summary['p50']:>10.3f} {base['p50']:>10.3f} {ratio:>7.2f}{flag}")
+    return regressions
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Headless rendering and I/O benchmarks with synthetic wound loads")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma separated wound counts (default: %(default)s)")
+    parser.add_argument("--frames", type=int, default=120, help="frames and erase clicks per size")
+    parser.add_argument("--repeats", type=int, default=5, help="load and save repetitions per size")
+    parser.add_argument("-o", "--output", default="bench_results.json", help="where to write the results")
+    parser.add_argument("--baseline", help="results file of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=1.10,
+                        help="p50 ratio over the baseline that counts as a regression")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # Keep the benchmark away from the real session and its journal
+        main.DATA_FILE = os.path.join(workdir, "autopsy_data.json")
+        main.USE_JOURNAL = False
+        app = main.App()
+
+        results = {}
+        for count in (int(size) for size in args.sizes.split(",")):
+            print(f"Benchmarking {count} wounds...")
+            results[str(count)] = bench_size(app, count, args.frames, args.repeats, workdir)
+        app.io.stop()
+
+    report = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "platform": platform.platform(),
+            "frames": args.frames,
+            "repeats": args.repeats
+        },
+        "results": results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)["results"]
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
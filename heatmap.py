@@ -0,0 +1,87 @@
+import os
+import sys
+import argparse
+
+# Render without a window; this has to happen before main initializes pygame
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+import main
+from render_sessions import find_sessions
+
+# Function to accumulate sessions into one heatmap per diagram, reading one
+# session at a time so memory stays bounded by the largest session
+def build_heatmaps(paths, archive=None):
+    heatmaps = {}
+    failures = 0
+    for path in paths:
+        try:
+            diagram, wounds, _ = main.read_session(path)
+        except Exception as e:
+            failures += 1
+            print(f"Error reading {path}: {e}")
+            continue
+        if diagram not in main.DIAGRAMS:
+            # Same as the app, which treats a missing diagram as no session
+            print(f"Skipping {path}: no known diagram ({diagram})")
+            continue
+        heatmaps.setdefault(diagram, main.Heatmap()).add_store(wounds)
+
+    if archive:
+        store = main.SessionStore(archive)
+        for diagram in main.DIAGRAMS:
+            for chunk in store.wound_chunks(diagram):
+                heatmaps.setdefault(diagram, main.Heatmap()).add_records(chunk)
+        store.close()
+    return heatmaps, failures
+
+# Function to save a heatmap drawn over its diagram as a PNG
+def save_heatmap(diagram, heatmap, diagram_images, output_dir, sigma):
+    overlay = heatmap.surface(sigma)
+    canvas = pygame.Surface(overlay.get_size(), 0, 32)
+    canvas.fill(main.DARK_GRAY)
+    image = diagram_images.get(diagram)
+    if image is not None:
+        canvas.blit(image, (0, 0))
+    canvas.blit(overlay, (0, 0))
+
+    name = diagram.lower().replace(" ", "_")
+    output_path = os.path.join(output_dir, f"heatmap_{name}.png")
+    pygame.image.save(canvas, output_path)
+    return output_path
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Render wound density heatmaps across many sessions")
+    parser.add_argument("sessions", nargs="*", help="session files (.json or .autopsy) or directories of them")
+    parser.add_argument("--archive", nargs="?", const=main.SESSION_DB, metavar="DB",
+                        help=f"also include the session archive (default {main.SESSION_DB})")
+    parser.add_argument("-o", "--output", default=".", help="directory for the PNG files (default: current directory)")
+    parser.add_argument("--sigma", type=float, default=main.HEATMAP_SIGMA,
+                        help="blur radius in grid cells (default %(default)g)")
+    parser.add_argument("--npy", action="store_true", help="also save each blurred density grid as a .npy file")
+    args = parser.parse_args()
+
+    try:
+        import numpy as np
+    except ImportError:
+        print("The heatmap needs NumPy (pip install numpy)")
+        return 1
+
+    heatmaps, failures = build_heatmaps(find_sessions(args.sessions), args.archive)
+    if not heatmaps:
+        print("No wounds found")
+        return 1
+    os.makedirs(args.output, exist_ok=True)
+
+    diagram_images, _ = main.load_images()
+    for diagram, heatmap in heatmaps.items():
+        output_path = save_heatmap(diagram, heatmap, diagram_images, args.output, args.sigma)
+        print(f"{diagram}: {heatmap.wound_count} traumas -> {output_path}")
+        if args.npy:
+            np.save(os.path.splitext(output_path)[0] + ".npy", heatmap.blurred(args.sigma))
+
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -2,7 +2,22 @@ import pygame
 import sys
 import os
 import json
-from collections import defaultdict
+import base64
+import math
+import time
+import mmap
+import glob
+import struct
+import sqlite3
+import argparse
+import importlib.util
+import itertools
+import threading
+import queue
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 
 # Initialize pygame
 pygame.init()
@@ -74,90 +89,850 @@ WOUND_COLORS = {
     "AMPUTATION": (255, 100, 0)  # Orange for amputation
 }
 
+# Frame rate cap for the render loop
+FPS_CAP = 60
+
+# Wound size limits used by the size buttons
+MIN_WOUND_SIZE = 20
+MAX_WOUND_SIZE = 80
+WOUND_SIZE_STEP = 5
+
+# Paint mode stamps a wound every STROKE_SPACING * wound size pixels
+STROKE_SPACING = 0.75
+
 # JSON file for saving/loading data
 DATA_FILE = "autopsy_data.json"
 
-# Function to load images with error handling
-def load_images():
-    diagram_images = {}
-    wound_images = {}
-    
-    # Load diagram images
-    for name, path in DIAGRAMS.items():
-        try:
-            # Load and scale the image to fit the diagram area
+# Event posted by the background I/O worker when a job finishes
+IO_DONE_EVENT = pygame.USEREVENT + 1
+
+# Live session sync: the host serves its changes to viewers over TCP, and a
+# viewer's sync thread posts what it receives as SYNC_EVENTs (message)
+SYNC_PORT = 7077
+SYNC_EVENT = pygame.USEREVENT + 2
+SYNC_LINE_LIMIT = 64 * 1024 * 1024
+SYNC_MAX_BUFFER = 16 * 1024 * 1024
+SYNC_RETRY_DELAY = 2.0
+
+# Binary session files: a fixed header, the diagram and wound type names,
+# then one record of four little-endian int32s (type, x, y, size) per wound,
+# wide enough for any value a WoundStore holds. Version 1 files have int16
+# records and no journal generation in the header.
+BINARY_EXTENSION = ".autopsy"
+BINARY_MAGIC = b"CYAU"
+BINARY_VERSION = 2
+BINARY_HEADERS = {
+    1: struct.Struct("<4sHHIIH"),
+    2: struct.Struct("<4sHHQIIH")
+}
+BINARY_RECORD_TYPES = {1: 'h', 2: 'i'}
+NO_JOURNAL_SEQ = 0xFFFFFFFF
+
+# Journaled persistence: every change is appended to a journal next to
+# DATA_FILE, and every so many changes the journal is compacted into a
+# snapshot file of its own. DATA_FILE itself changes on SAVE and on quit.
+USE_JOURNAL = True
+JOURNAL_SNAPSHOT_EVERY = 500
+
+# Undo history entries are dropped, oldest first, beyond this many bytes
+HISTORY_MEMORY_CAP = 32 * 1024 * 1024
+
+# Archive of many named sessions; wounds are also indexed by the coarse
+# diagram region (REGION_SIZE pixel squares) they fall in
+SESSION_DB = "autopsy_sessions.db"
+REGION_SIZE = 100
+
+# Session archive browser in the stats panel
+SESSION_ROWS = 4
+SESSION_ROW_HEIGHT = 28
+SESSION_LIST_TOP = 50
+
+# Wound density heatmaps: wounds are counted into HEATMAP_CELL pixel cells,
+# weighted by size (relative to a size of 40) and by type, then blurred
+HEATMAP_CELL = 4
+HEATMAP_SIGMA = 5
+HEATMAP_CHUNK = 65536
+HEATMAP_ALPHA = 190
+HEATMAP_TYPE_WEIGHTS = {
+    "AMPUTATION": 3.0,
+    "EXPLOSION": 2.0,
+    "GUNSHOT WOUND": 1.5
+}
+# Color ramp from cold to hot: (position, (r, g, b))
+HEATMAP_RAMP = [(0.0, DARK_PURPLE), (0.35, NEON_PURPLE), (0.7, NEON_PINK), (1.0, NEON_YELLOW)]
+
+# Images are decoded on a small thread pool, and scaled pixels are kept in
+# ASSET_CACHE_DIR so later launches skip the PNG decode and the scale
+ASSET_CACHE_DIR = ".asset_cache"
+ASSET_WORKERS = 4
+ASSET_HEADER = struct.Struct("<II")
+DIAGRAM_SIZE = (800, 900)
+
+# Bounded cache with least-recently-used eviction and hit/miss counters
+class LRUCache:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+        
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            
+    def clear(self):
+        self.entries.clear()
+        
+    def __len__(self):
+        return len(self.entries)
+
+# Scaled wound images keyed by (wound type, size), shared by all wounds
+class SpriteCache(LRUCache):
+    def __init__(self, capacity=128):
+        super().__init__(capacity)
+        
+    def scaled(self, wound_type, size, img):
+        key = (wound_type, size)
+        sprite = self.get(key)
+        if sprite is None:
+            sprite = self.scale(img, size)
+            self.put(key, sprite)
+        return sprite
+        
+    def scale(self, img, size):
+        # Sprites are stored with premultiplied alpha so they composite
+        # correctly onto the transparent wound layer as well as the screen
+        return pygame.transform.scale(img, (size * 2, size * 2)).premul_alpha()
+        
+    def populate(self, wound_images):
+        # Pre-scale every size the size buttons can reach
+        self.clear()
+        for wound_type, img in wound_images.items():
+            if img:
+                for size in range(MIN_WOUND_SIZE, MAX_WOUND_SIZE + 1, WOUND_SIZE_STEP):
+                    self.put((wound_type, size), self.scale(img, size))
+
+wound_sprites = SpriteCache()
+
+# Rendered text surfaces keyed by (font, text, color)
+class TextCache(LRUCache):
+    def render(self, font, text, color):
+        key = (font, text, color)
+        surface = self.get(key)
+        if surface is None:
+            surface = font.render(text, True, color)
+            self.put(key, surface)
+        return surface
+
+text_cache = TextCache(256)
+
+# Function to prepare a surface that is only ever blitted: convert it to the
+# display's pixel format and, for images with large fully transparent or
+# fully opaque areas, run-length encode it
+def display_format(surface, alpha=False, rle=False):
+    surface = surface.convert_alpha() if alpha else surface.convert()
+    if rle:
+        surface.set_alpha(255, pygame.RLEACCEL)
+    return surface
+
+# Owns every image asset. Source files are decoded on a thread pool and kept,
+# and display-format copies are made from them once per target size, so a
+# size that was used before is a dictionary lookup. Scaled pixels are also
+# cached on disk under a name made of the source file, the target size and
+# the source file's modification time, so editing an asset invalidates its
+# cache entries and a warm start never decodes a PNG.
+class AssetManager:
+    def __init__(self, cache_dir=ASSET_CACHE_DIR, workers=ASSET_WORKERS):
+        self.cache_dir = cache_dir
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="assets")
+        self.lock = threading.Lock()
+        self.originals = {}  # path -> decoded source image, shared with the pool threads
+        self.pending = {}    # (path, size, alpha) -> future of the scaled pixels
+        self.variants = {}   # (path, size, alpha) -> display-format surface
+        
+    def prefetch(self, path, size=None, alpha=False):
+        # Queue a variant on the pool without waiting for it
+        key = (path, tuple(size) if size else None, alpha)
+        if key not in self.variants and key not in self.pending:
+            self.pending[key] = self.pool.submit(self.prepare, *key)
+        return key
+        
+    def get(self, path, size=None, alpha=False):
+        # Display-format variant of an image; the first call for a size waits
+        # for the pool and converts on this thread, later calls are lookups
+        key = (path, tuple(size) if size else None, alpha)
+        surface = self.variants.get(key)
+        if surface is None:
+            self.prefetch(*key)
+            surface = display_format(self.pending.pop(key).result(), alpha)
+            self.variants[key] = surface
+        return surface
+        
+    def original(self, path):
+        # Runs on a pool thread. Two sizes of a new image can race to decode
+        # it; the first one to finish is kept.
+        with self.lock:
+            img = self.originals.get(path)
+        if img is None:
             img = pygame.image.load(path)
-            # Scale to fit the diagram area (keeping aspect ratio)
-            img_width = 800
-            img_height = 900
-            img = pygame.transform.scale(img, (img_width, img_height))
-            diagram_images[name] = img
-        except:
-            print(f"Error loading diagram image: {path}")
-            # Create a placeholder if image can't be loaded
-            placeholder = pygame.Surface((800, 900))
-            placeholder.fill(DARK_GRAY)
-            pygame.draw.rect(placeholder, NEON_BLUE, (0, 0, 800, 900), 2)
-            text = font.render(f"IMAGE NOT FOUND: {path}", True, NEON_PINK)
-            text_rect = text.get_rect(center=(400, 450))
-            placeholder.blit(text, text_rect)
-            diagram_images[name] = placeholder
+            with self.lock:
+                img = self.originals.setdefault(path, img)
+        return img
+        
+    def cache_path(self, path, size, mtime_ns, pixel_format):
+        name = os.path.splitext(os.path.basename(path))[0]
+        size_key = f"{size[0]}x{size[1]}" if size else "native"
+        return os.path.join(self.cache_dir, f"{name}-{size_key}-{mtime_ns}.{pixel_format.lower()}")
+        
+    def prepare(self, path, size, alpha):
+        # Runs on a pool thread; display conversion is left to get()
+        pixel_format = "RGBA" if alpha else "RGB"
+        cache_path = self.cache_path(path, size, os.stat(path).st_mtime_ns, pixel_format)
+        try:
+            with open(cache_path, 'rb') as f:
+                data = f.read()
+            width, height = ASSET_HEADER.unpack_from(data)
+            return pygame.image.frombytes(data[ASSET_HEADER.size:], (width, height), pixel_format)
+        except (OSError, ValueError, struct.error):
+            pass
+        
+        img = self.original(path)
+        if size and img.get_size() != size:
+            img = pygame.transform.scale(img, size)
+        self.store(cache_path, img, pixel_format)
+        return img
+        
+    def store(self, cache_path, img, pixel_format):
+        # A cache that cannot be written only costs the next launch a decode
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temp_path = cache_path + ".tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(ASSET_HEADER.pack(*img.get_size()))
+                f.write(pygame.image.tobytes(img, pixel_format))
+            os.replace(temp_path, cache_path)
+            # Drop entries for older versions of the same file at this size
+            stale_pattern = cache_path.rsplit("-", 1)[0] + "-*." + pixel_format.lower()
+            for stale in glob.glob(stale_pattern):
+                if stale != cache_path:
+                    os.remove(stale)
+        except OSError:
+            pass
+            
+    def shutdown(self):
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+# Diagram images at one size. Only the diagram named by first is queued on
+# the asset manager up front; the others are decoded when first looked up,
+# or in the background once prefetch() is called.
+class DiagramImages:
+    def __init__(self, assets, size=DIAGRAM_SIZE, first=None):
+        self.assets = assets
+        self.size = tuple(size)
+        self.placeholders = {}
+        if first in DIAGRAMS:
+            assets.prefetch(DIAGRAMS[first], self.size)
+            
+    def prefetch(self):
+        # Queue every diagram at this size without waiting for it
+        for path in DIAGRAMS.values():
+            if path not in self.placeholders:
+                self.assets.prefetch(path, self.size)
+            
+    def __getitem__(self, name):
+        path = DIAGRAMS[name]
+        if path in self.placeholders:
+            return self.placeholders[path]
+        try:
+            return self.assets.get(path, self.size)
+        except Exception:
+            self.placeholders[path] = self.placeholder(path)
+            return self.placeholders[path]
+        
+    def __contains__(self, name):
+        return name in DIAGRAMS
+        
+    def __iter__(self):
+        return iter(DIAGRAMS)
+        
+    def get(self, name, default=None):
+        return self[name] if name in DIAGRAMS else default
+        
+    def resized(self, size, first=None):
+        return DiagramImages(self.assets, size, first)
+        
+    def placeholder(self, path):
+        print(f"Error loading diagram image: {path}")
+        # Create a placeholder if image can't be loaded
+        width, height = self.size
+        placeholder = pygame.Surface(self.size)
+        placeholder.fill(DARK_GRAY)
+        pygame.draw.rect(placeholder, NEON_BLUE, (0, 0, width, height), 2)
+        text = font.render(f"IMAGE NOT FOUND: {path}", True, NEON_PINK)
+        text_rect = text.get_rect(center=(width // 2, height // 2))
+        placeholder.blit(text, text_rect)
+        return placeholder.convert()
+
+# Function to load images with error handling. Only the diagram named by
+# first is queued; wound images are needed for the first frame, so they are
+# waited for here while that diagram decodes.
+def load_images(assets=None, first=None):
+    assets = assets or AssetManager()
+    diagram_images = DiagramImages(assets, DIAGRAM_SIZE, first)
+    for path in WOUND_TYPES.values():
+        if path:  # Skip amputation which has no asset
+            assets.prefetch(path, alpha=True)
     
-    # Load wound images
+    wound_images = {}
     for name, path in WOUND_TYPES.items():
-        if path:  # Skip amputation which has no asset
+        if path:
             try:
-                img = pygame.image.load(path).convert_alpha()
-                wound_images[name] = img
-            except:
+                wound_images[name] = assets.get(path, alpha=True)
+            except Exception:
                 print(f"Error loading wound image: {path}")
                 wound_images[name] = None
     
+    wound_sprites.populate(wound_images)
+    
     return diagram_images, wound_images
 
-# Function to save data to JSON
-def save_data(diagram, wounds):
-    data = {
-        "current_diagram": diagram,
-        "wounds": []
-    }
-    
-    for wound in wounds:
-        wound_data = {
-            "type": wound.wound_type,
-            "position": wound.position,
-            "size": wound.size
+# Function to write a session file atomically (the old file stays intact
+# until the new one is complete); the format follows the file extension.
+# Journal snapshots pass journal as their (generation, seq).
+def write_session(path, diagram, wounds, journal=None):
+    if path.endswith(BINARY_EXTENSION):
+        payload = pack_binary_session(diagram, wounds, journal)
+        mode = 'wb'
+    else:
+        data = {
+            "current_diagram": diagram,
+            "wounds": wounds.to_dicts(),
+            "stats": wounds.summary()
         }
-        data["wounds"].append(wound_data)
+        if journal is not None:
+            data["journal_generation"], data["journal_seq"] = journal
+        payload = json.dumps(data)
+        mode = 'w'
+    
+    temp_path = path + ".tmp"
+    with open(temp_path, mode) as f:
+        f.write(payload)
+    os.replace(temp_path, path)
+
+# Function to read a session file, raising on any error. Returns the
+# diagram, the wounds and, for a journal snapshot, its (generation, seq).
+def read_session(path):
+    if path.endswith(BINARY_EXTENSION):
+        return read_binary_session(path)
+    
+    with open(path, 'r') as f:
+        data = json.load(f)
+    
+    journal = None
+    if "journal_generation" in data:
+        journal = (data["journal_generation"], data["journal_seq"])
+    return data["current_diagram"], WoundStore.from_dicts(data["wounds"]), journal
+
+# Function to pack a session into the binary format
+def pack_binary_session(diagram, wounds, journal=None):
+    names = [name.encode() for name in wounds.type_names]
+    diagram_bytes = (diagram or "").encode()
+    generation, journal_seq = journal or (0, NO_JOURNAL_SEQ)
+    header = BINARY_HEADERS[BINARY_VERSION].pack(BINARY_MAGIC, BINARY_VERSION, len(names), generation,
+                                                 journal_seq, len(wounds), len(diagram_bytes))
+    header += diagram_bytes + b"".join(bytes([len(name)]) + name for name in names)
+    # Align the records to 8 bytes
+    header += bytes(-len(header) % 8)
     
-    with open(DATA_FILE, 'w') as f:
-        json.dump(data, f)
+    # Interleave the store columns into packed records
+    typecode = BINARY_RECORD_TYPES[BINARY_VERSION]
+    records = array(typecode, bytes(4 * array(typecode).itemsize * len(wounds)))
+    for field, column in enumerate(wounds.live_columns()):
+        records[field::4] = array(typecode, column)
+    if sys.byteorder == "big":
+        records.byteswap()
+    return header + records.tobytes()
+
+# Function to read a binary session through a memory map. The header is
+# parsed and the record area bounds-checked in place, and the records are
+# copied once, straight from the mapped pages, before being split into the
+# store's columns. The whole session is read before this returns.
+def read_binary_session(path):
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return unpack_binary_session(mm, path)
+
+# Function to unpack a binary session from a buffer (a memory map or bytes);
+# name is only used in error messages
+def unpack_binary_session(buffer, name="session"):
+    magic, version = struct.unpack_from("<4sH", buffer, 0) if len(buffer) >= 6 else (None, None)
+    if magic != BINARY_MAGIC or version not in BINARY_HEADERS:
+        raise ValueError(f"{name} is not a version {BINARY_VERSION} session file")
+    header = BINARY_HEADERS[version]
+    if len(buffer) < header.size:
+        raise ValueError(f"{name} is truncated")
+    fields = header.unpack_from(buffer, 0)
+    if version == 1:
+        generation = None
+        type_count, journal_seq, count, diagram_len = fields[2:]
+    else:
+        type_count, generation, journal_seq, count, diagram_len = fields[2:]
+    
+    offset = header.size
+    diagram = buffer[offset:offset + diagram_len].decode() or None
+    offset += diagram_len
+    type_names = []
+    for _ in range(type_count):
+        length = buffer[offset]
+        type_names.append(buffer[offset + 1:offset + 1 + length].decode())
+        offset += 1 + length
+    offset += -offset % 8
+    
+    records = array(BINARY_RECORD_TYPES[version])
+    end = offset + 4 * records.itemsize * count
+    if end > len(buffer):
+        raise ValueError(f"{name} is truncated")
+    with memoryview(buffer) as view:
+        records.frombytes(view[offset:end])
+    
+    if sys.byteorder == "big":
+        records.byteswap()
+    wounds = WoundStore.from_columns(type_names, records[0::4], records[1::4], records[2::4], records[3::4])
+    if generation is None or journal_seq == NO_JOURNAL_SEQ:
+        return diagram, wounds, None
+    return diagram, wounds, (generation, journal_seq)
+
+# Function to convert a session between the JSON and binary formats
+def convert_session(source, target):
+    diagram, wounds, journal = read_session(source)
+    write_session(target, diagram, wounds, journal)
+    print(f"Converted {source} to {target}")
+
+# Function to save data to JSON (or the binary format, by extension)
+def save_data(diagram, wounds, path=None):
+    path = path or DATA_FILE
+    write_session(path, diagram, wounds)
     
-    print(f"Data saved to {DATA_FILE}")
+    print(f"Data saved to {path}")
 
-# Function to load data from JSON
-def load_data():
-    if not os.path.exists(DATA_FILE):
-        return None, []
+# Function to load data from JSON (or the binary format, by extension)
+def load_data(path=None):
+    path = path or DATA_FILE
+    if not os.path.exists(path):
+        return None, WoundStore()
     
     try:
-        with open(DATA_FILE, 'r') as f:
-            data = json.load(f)
-        
-        wounds = []
-        for wound_data in data["wounds"]:
-            wounds.append(Wound(
-                wound_data["type"],
-                wound_data["position"],
-                wound_data["size"]
-            ))
-        
-        return data["current_diagram"], wounds
+        diagram, wounds, _ = read_session(path)
+        return diagram, wounds
     except:
-        print(f"Error loading data from {DATA_FILE}")
-        return None, []
+        print(f"Error loading data from {path}")
+        return None, WoundStore()
+
+# Function to apply one change record to a session, returning the diagram.
+# Change records are what the journal stores and live sync sends:
+#   {"op": "add", "wounds": [[type, x, y, size], ...]}
+#   {"op": "erase", "rows": [row, ...]}
+#   {"op": "insert", "rows": [row, ...], "wounds": [[type, x, y, size], ...]}
+#   {"op": "clear"}
+#   {"op": "load", "diagram": name, "wounds": [[type, x, y, size], ...]}
+#   {"op": "diagram", "name": name}
+# The journal stores a load as "session", the base64 of the whole session in
+# the binary format, instead of "wounds".
+def apply_change(diagram, wounds, change):
+    op = change["op"]
+    if op == "add":
+        wounds.extend(change["wounds"])
+    elif op == "erase":
+        wounds.delete_rows(change["rows"])
+    elif op == "insert":
+        wounds.insert(change["rows"], change["wounds"])
+    elif op == "clear":
+        wounds.clear()
+    elif op == "load":
+        wounds.clear()
+        if "session" in change:
+            _, loaded, _ = unpack_binary_session(base64.b64decode(change["session"]), "journaled session")
+            wounds.extend(loaded.records())
+        else:
+            wounds.extend(change["wounds"])
+        diagram = change["diagram"]
+    elif op == "diagram":
+        diagram = change["name"]
+    return diagram
+
+# Single background thread that runs file I/O jobs in submission order and
+# posts an IO_DONE_EVENT (kind, result, error) back to the frame loop
+class IOWorker:
+    def __init__(self):
+        self.jobs = queue.Queue()
+        self.thread = threading.Thread(target=self.work, name="io-worker", daemon=True)
+        self.thread.start()
+        
+    def submit(self, kind, func, *args):
+        self.jobs.put((kind, func, args))
+        
+    def work(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                self.jobs.task_done()
+                return
+            kind, func, args = job
+            result, error = None, None
+            try:
+                result = func(*args)
+            except Exception as e:
+                error = e
+            pygame.event.post(pygame.event.Event(IO_DONE_EVENT, kind=kind, result=result, error=error))
+            self.jobs.task_done()
+            
+    def flush(self):
+        # Block until every submitted job has finished
+        self.jobs.join()
+        
+    def stop(self):
+        self.jobs.put(None)
+        self.thread.join()
+
+# Append-only change journal with background snapshots. The journal is
+# compacted into a snapshot file of its own, so DATA_FILE only holds what
+# SAVE or the last quit wrote, and a DATA_FILE newer than the journal (say,
+# replaced while the app was closed) wins over it at startup. A snapshot
+# records its generation, an id shared by every snapshot of one journal, and
+# the first segment it does not include.
+# Segments are numbered and named after their generation, so replay after a
+# crash never applies a change twice, or to a session it does not extend.
+# Files replay cannot use are renamed to *.bak, never deleted, and the
+# problem is kept in error for the app to report.
+class Journal:
+    def __init__(self, worker, data_file=None, snapshot_every=None):
+        self.worker = worker
+        self.data_file = data_file or DATA_FILE
+        base, extension = os.path.splitext(self.data_file)
+        self.snapshot_file = f"{base}.snapshot{extension}"
+        self.snapshot_every = snapshot_every or JOURNAL_SNAPSHOT_EVERY
+        self.generation = None
+        self.seq = 0
+        self.file = None
+        self.pending = 0
+        self.error = None
+        
+    def segment_path(self, generation, seq):
+        # Named after the whole data file, so table.json and table.autopsy
+        # keep separate journals
+        return f"{self.data_file}.{generation:016x}.{seq}.journal"
+        
+    def segments(self):
+        # (generation, seq) of every segment on disk, in replay order
+        prefix = os.path.basename(self.data_file) + "."
+        folder = os.path.dirname(self.data_file) or "."
+        found = []
+        for name in os.listdir(folder):
+            if name.startswith(prefix) and name.endswith(".journal"):
+                generation, _, seq = name[len(prefix):-len(".journal")].partition(".")
+                try:
+                    found.append((int(generation, 16), int(seq)))
+                except ValueError:
+                    continue
+        return sorted(found)
+        
+    def read(self):
+        # Read the last snapshot, raising unless it is one
+        diagram, wounds, journal = read_session(self.snapshot_file)
+        if journal is None:
+            raise ValueError(f"{self.snapshot_file} is not a journal snapshot")
+        return diagram, wounds, journal
+        
+    def replay(self, diagram, wounds, journal_seq, limit=None):
+        # Apply the segments of this generation from journal_seq on, at most
+        # limit records. Returns the diagram, the records applied and, if a
+        # record could not be applied, its segment and the error.
+        applied = 0
+        for generation, seq in self.segments():
+            if generation != self.generation or seq < journal_seq:
+                continue
+            with open(self.segment_path(generation, seq), 'r') as f:
+                for line in f:
+                    if applied == limit:
+                        return diagram, applied, None
+                    if not line.endswith("\n"):
+                        # Partially written record from a crash
+                        break
+                    try:
+                        diagram = apply_change(diagram, wounds, json.loads(line))
+                    except Exception as e:
+                        return diagram, applied, (seq, e)
+                    applied += 1
+        return diagram, applied, None
+        
+    def load(self, diagram=None):
+        # Restore the session as it was left: the snapshot and its segments,
+        # or without one, what SAVE last wrote (a new session starts on diagram)
+        self.close()
+        self.error = None
+        if os.path.exists(self.snapshot_file) and not self.data_file_newer():
+            try:
+                snapshot_diagram, wounds, (self.generation, journal_seq) = self.read()
+            except Exception as e:
+                self.report(f"cannot read {self.snapshot_file}: {e}")
+                self.set_aside(self.snapshot_file)
+            else:
+                return self.restore(snapshot_diagram, wounds, journal_seq)
+        
+        # Start a new generation from the data file. Its first snapshot is
+        # written before any segment, as the segments cannot replay without it.
+        saved_diagram, wounds = load_data(self.data_file)
+        if saved_diagram:
+            diagram = saved_diagram
+        self.generation = int.from_bytes(os.urandom(8), "little")
+        self.seq = 0
+        self.discard(0)
+        self.write_snapshot(diagram, wounds, self.generation, self.seq)
+        return diagram, wounds
+        
+    def data_file_newer(self):
+        # Whether the data file was written after the snapshot and every segment
+        if not os.path.exists(self.data_file):
+            return False
+        journal_files = [self.snapshot_file] + [self.segment_path(*segment) for segment in self.segments()]
+        newer = os.stat(self.data_file).st_mtime_ns > max(os.stat(path).st_mtime_ns for path in journal_files)
+        if newer:
+            print(f"{self.data_file} is newer than its journal, loading it instead")
+        return newer
+        
+    def restore(self, diagram, wounds, journal_seq):
+        # Replay the segments after the snapshot that was just read
+        last_seq = max([seq for generation, seq in self.segments() if generation == self.generation],
+                       default=journal_seq)
+        replayed_diagram, replayed, failure = self.replay(diagram, wounds, journal_seq)
+        # Never append after a possibly truncated record; start a new segment
+        self.seq = last_seq + 1
+        self.pending = replayed
+        if failure is None:
+            # Segments of other generations, or already part of the snapshot
+            # and left behind by an interrupted compaction
+            self.discard(journal_seq)
+            return replayed_diagram, wounds
+        
+        # The failed record may have been partly applied, so replay again up
+        # to the record before it, and keep the session there
+        failed_seq, error = failure
+        self.report(f"journal replay stopped in segment {failed_seq} after {replayed} changes: {error}")
+        diagram, wounds, _ = self.read()
+        diagram, _, _ = self.replay(diagram, wounds, journal_seq, replayed)
+        for generation, seq in self.segments():
+            if generation == self.generation and seq >= failed_seq:
+                self.set_aside(self.segment_path(generation, seq))
+        # The good records of the failed segment are only in memory now
+        self.write_snapshot(diagram, wounds, self.generation, self.seq)
+        self.discard(self.seq)
+        self.pending = 0
+        return diagram, wounds
+        
+    def report(self, error):
+        self.error = error
+        print(f"Journal error: {error}")
+        
+    def set_aside(self, path):
+        # Rename a file replay cannot use out of the way, never over another
+        number = 1
+        while os.path.exists(f"{path}.{number}.bak"):
+            number += 1
+        os.rename(path, f"{path}.{number}.bak")
+        
+    def discard(self, journal_seq):
+        # Remove the segments the current snapshot already includes; set
+        # aside those of other generations, which nothing can replay
+        for generation, seq in self.segments():
+            if generation != self.generation:
+                self.set_aside(self.segment_path(generation, seq))
+            elif seq < journal_seq:
+                os.remove(self.segment_path(generation, seq))
+        
+    def append(self, change):
+        if self.file is None:
+            self.file = open(self.segment_path(self.generation, self.seq), 'a')
+        self.file.write(json.dumps(change, separators=(',', ':')) + "\n")
+        self.file.flush()
+        self.pending += 1
+        
+    def append_load(self, diagram, wounds):
+        # A loaded session goes into the journal whole, so a crash before the
+        # next snapshot never replays later changes onto the session it replaced
+        session = base64.b64encode(pack_binary_session(diagram, wounds)).decode()
+        self.append({"op": "load", "diagram": diagram, "session": session})
+        
+    def needs_snapshot(self):
+        return self.pending >= self.snapshot_every
+        
+    def snapshot(self, diagram, wounds):
+        # Start a new segment and compact everything before it into the
+        # snapshot file on the I/O worker
+        self.close()
+        self.seq += 1
+        self.pending = 0
+        self.worker.submit("snapshot", self.write_snapshot, diagram, wounds.copy(), self.generation, self.seq)
+        
+    def write_snapshot(self, diagram, wounds, generation, journal_seq):
+        write_session(self.snapshot_file, diagram, wounds, (generation, journal_seq))
+        for segment_generation, seq in self.segments():
+            if segment_generation == generation and seq < journal_seq:
+                os.remove(self.segment_path(generation, seq))
+        return self.snapshot_file
+        
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+# Function to name the diagram region a point falls in: a letter for the
+# column and a number for the row of REGION_SIZE squares, e.g. "C4". Points
+# off the diagram count toward its nearest edge region.
+def region_of(x, y):
+    x = min(max(0, x), DIAGRAM_SIZE[0] - 1)
+    y = min(max(0, y), DIAGRAM_SIZE[1] - 1)
+    return f"{chr(ord('A') + x // REGION_SIZE)}{y // REGION_SIZE + 1}"
+
+# Many named sessions in one SQLite database, one row per wound. The indexes
+# on session, diagram, wound type and region answer aggregate queries
+# without reading any session back. A connection can only be used by the
+# thread that opened it, so it is opened on first use; in the app that is
+# the I/O worker.
+class SessionStore:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            diagram TEXT NOT NULL,
+            wound_count INTEGER NOT NULL,
+            updated REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS wounds (
+            session_id INTEGER NOT NULL REFERENCES sessions(id) ON DELETE CASCADE,
+            seq INTEGER NOT NULL,
+            type TEXT NOT NULL,
+            x INTEGER NOT NULL,
+            y INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            region TEXT NOT NULL,
+            PRIMARY KEY (session_id, seq)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS sessions_diagram ON sessions(diagram);
+        CREATE INDEX IF NOT EXISTS sessions_updated ON sessions(updated);
+        CREATE INDEX IF NOT EXISTS wounds_type ON wounds(type, session_id, region);
+        CREATE INDEX IF NOT EXISTS wounds_region ON wounds(region, type);
+    """
+    
+    def __init__(self, path=None):
+        self.path = path or SESSION_DB
+        self.db = None
+        
+    def connect(self):
+        if self.db is None:
+            self.db = sqlite3.connect(self.path)
+            self.db.execute("PRAGMA foreign_keys = ON")
+            self.db.executescript(self.SCHEMA)
+        return self.db
+        
+    def save(self, name, diagram, wounds, replace=True):
+        # Store a session under name and return the name it was stored as.
+        # A session of that name is replaced, or with replace=False kept and
+        # the new one stored as "name (2)", "name (3)" and so on.
+        db = self.connect()
+        with db:
+            if not replace:
+                name = self.free_name(name)
+            row = db.execute("SELECT id FROM sessions WHERE name = ?", (name,)).fetchone()
+            if row:
+                session_id = row[0]
+                db.execute("DELETE FROM wounds WHERE session_id = ?", (session_id,))
+                db.execute("UPDATE sessions SET diagram = ?, wound_count = ?, updated = ? WHERE id = ?",
+                           (diagram, wounds.stats.total, time.time(), session_id))
+            else:
+                session_id = db.execute("INSERT INTO sessions (name, diagram, wound_count, updated) VALUES (?, ?, ?, ?)",
+                                        (name, diagram, wounds.stats.total, time.time())).lastrowid
+            db.executemany("INSERT INTO wounds VALUES (?, ?, ?, ?, ?, ?, ?)",
+                           ((session_id, seq, wound_type, x, y, size, region_of(x, y))
+                            for seq, (wound_type, x, y, size) in enumerate(wounds.records())))
+        return name
+        
+    def free_name(self, name):
+        taken = {row[0] for row in self.connect().execute(
+            "SELECT name FROM sessions WHERE name = ? OR name LIKE ?", (name, name + " (%)"))}
+        candidate, number = name, 2
+        while candidate in taken:
+            candidate = f"{name} ({number})"
+            number += 1
+        return candidate
+        
+    def load(self, name):
+        # Same shape as read_session: (diagram, wounds, journal)
+        db = self.connect()
+        row = db.execute("SELECT id, diagram FROM sessions WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise KeyError(f"no archived session named {name}")
+        records = db.execute("SELECT type, x, y, size FROM wounds WHERE session_id = ? ORDER BY seq", (row[0],))
+        return row[1], WoundStore(records), None
+        
+    def wound_chunks(self, diagram, chunk_size=HEATMAP_CHUNK):
+        # Every archived (type, x, y, size) for one diagram, chunk_size rows at a time
+        cursor = self.connect().execute(
+            "SELECT w.type, w.x, w.y, w.size FROM wounds w "
+            "WHERE w.session_id IN (SELECT id FROM sessions WHERE diagram = ?)", (diagram,))
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield rows
+            
+    def list_sessions(self, diagram=None):
+        # (name, diagram, wound count, updated) tuples, most recent first
+        query = "SELECT name, diagram, wound_count, updated FROM sessions"
+        if diagram is not None:
+            return self.connect().execute(query + " WHERE diagram = ? ORDER BY updated DESC", (diagram,)).fetchall()
+        return self.connect().execute(query + " ORDER BY updated DESC").fetchall()
+        
+    def type_counts(self, wound_type):
+        # How many wounds of one type each session has, e.g. gunshots per session
+        return self.connect().execute(
+            "SELECT s.name, COUNT(*) FROM wounds w JOIN sessions s ON s.id = w.session_id "
+            "WHERE w.type = ? GROUP BY w.session_id ORDER BY COUNT(*) DESC, s.name",
+            (wound_type,)).fetchall()
+            
+    def region_counts(self, diagram=None, wound_type=None, limit=10):
+        # The most-hit diagram regions, optionally for one diagram or wound type
+        conditions, params = [], []
+        if diagram is not None:
+            conditions.append("w.session_id IN (SELECT id FROM sessions WHERE diagram = ?)")
+            params.append(diagram)
+        if wound_type is not None:
+            conditions.append("w.type = ?")
+            params.append(wound_type)
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        return self.connect().execute(
+            f"SELECT w.region, COUNT(*) FROM wounds w{where} "
+            "GROUP BY w.region ORDER BY COUNT(*) DESC, w.region LIMIT ?",
+            (*params, limit)).fetchall()
+            
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
 
 class Button:
+    # Corner accents are drawn on the rect edges, so faces get a margin around the rect
+    FACE_MARGIN = 2
+    
     def __init__(self, x, y, width, height, text, color, hover_color, icon=None, outline_color=NEON_BLUE):
         self.rect = pygame.Rect(x, y, width, height)
         self.text = text
@@ -167,59 +942,177 @@ class Button:
         self.is_hovered = False
         self.icon = icon
         
+        # Pre-rendered normal and hover faces, rebuilt when the key changes
+        self.faces = None
+        self.face_key = None
+        
     def draw(self, surface):
-        color = self.hover_color if self.is_hovered else self.color
-        pygame.draw.rect(surface, color, self.rect, border_radius=3)
-        pygame.draw.rect(surface, self.outline_color, self.rect, 2, border_radius=3)
+        face_key = (self.rect.size, self.text, self.icon)
+        if face_key != self.face_key:
+            self.faces = (self.render_face(self.color), self.render_face(self.hover_color))
+            self.face_key = face_key
+        face = self.faces[1] if self.is_hovered else self.faces[0]
+        surface.blit(face, (self.rect.x - self.FACE_MARGIN, self.rect.y - self.FACE_MARGIN))
+        
+    def render_face(self, color):
+        margin = self.FACE_MARGIN
+        face = pygame.Surface((self.rect.width + 2 * margin, self.rect.height + 2 * margin), pygame.SRCALPHA)
+        rect = pygame.Rect(margin, margin, self.rect.width, self.rect.height)
+        pygame.draw.rect(face, color, rect, border_radius=3)
+        pygame.draw.rect(face, self.outline_color, rect, 2, border_radius=3)
         
         # Draw cyberpunk-style corner accents
         corner_size = 8
         # Top-left
-        pygame.draw.line(surface, self.outline_color, 
-                        (self.rect.left, self.rect.top + corner_size),
-                        (self.rect.left, self.rect.top), 2)
-        pygame.draw.line(surface, self.outline_color, 
-                        (self.rect.left + corner_size, self.rect.top),
-                        (self.rect.left, self.rect.top), 2)
+        pygame.draw.line(face, self.outline_color, 
+                        (rect.left, rect.top + corner_size),
+                        (rect.left, rect.top), 2)
+        pygame.draw.line(face, self.outline_color, 
+                        (rect.left + corner_size, rect.top),
+                        (rect.left, rect.top), 2)
         # Top-right
-        pygame.draw.line(surface, self.outline_color, 
-                        (self.rect.right, self.rect.top + corner_size),
-                        (self.rect.right, self.rect.top), 2)
-        pygame.draw.line(surface, self.outline_color, 
-                        (self.rect.right - corner_size, self.rect.top),
-                        (self.rect.right, self.rect.top), 2)
+        pygame.draw.line(face, self.outline_color, 
+                        (rect.right, rect.top + corner_size),
+                        (rect.right, rect.top), 2)
+        pygame.draw.line(face, self.outline_color, 
+                        (rect.right - corner_size, rect.top),
+                        (rect.right, rect.top), 2)
         # Bottom-left
-        pygame.draw.line(surface, self.outline_color, 
-                        (self.rect.left, self.rect.bottom - corner_size),
-                        (self.rect.left, self.rect.bottom), 2)
-        pygame.draw.line(surface, self.outline_color, 
-                        (self.rect.left + corner_size, self.rect.bottom),
-                        (self.rect.left, self.rect.bottom), 2)
+        pygame.draw.line(face, self.outline_color, 
+                        (rect.left, rect.bottom - corner_size),
+                        (rect.left, rect.bottom), 2)
+        pygame.draw.line(face, self.outline_color, 
+                        (rect.left + corner_size, rect.bottom),
+                        (rect.left, rect.bottom), 2)
         # Bottom-right
-        pygame.draw.line(surface, self.outline_color, 
-                        (self.rect.right, self.rect.bottom - corner_size),
-                        (self.rect.right, self.rect.bottom), 2)
-        pygame.draw.line(surface, self.outline_color, 
-                        (self.rect.right - corner_size, self.rect.bottom),
-                        (self.rect.right, self.rect.bottom), 2)
+        pygame.draw.line(face, self.outline_color, 
+                        (rect.right, rect.bottom - corner_size),
+                        (rect.right, rect.bottom), 2)
+        pygame.draw.line(face, self.outline_color, 
+                        (rect.right - corner_size, rect.bottom),
+                        (rect.right, rect.bottom), 2)
         
         if self.icon:
             # Scale icon to fit button
-            scaled_icon = pygame.transform.scale(self.icon, (self.rect.height - 10, self.rect.height - 10))
-            icon_rect = scaled_icon.get_rect(center=self.rect.center)
-            surface.blit(scaled_icon, icon_rect)
+            scaled_icon = pygame.transform.scale(self.icon, (rect.height - 10, rect.height - 10))
+            icon_rect = scaled_icon.get_rect(center=rect.center)
+            face.blit(scaled_icon, icon_rect)
         else:
-            text_surface = font.render(self.text, True, TEXT_COLOR)
-            text_rect = text_surface.get_rect(center=self.rect.center)
-            surface.blit(text_surface, text_rect)
+            text_surface = text_cache.render(font, self.text, TEXT_COLOR)
+            text_rect = text_surface.get_rect(center=rect.center)
+            face.blit(text_surface, text_rect)
+        
+        return display_format(face, alpha=True, rle=True)
+
+# Routes clicks and hover to widgets through a grid index of their rects.
+# Handlers are called with the click position; the first one that does not
+# return False claims the click and dispatch stops there.
+class EventRouter:
+    CELL_SIZE = 100
+    
+    def __init__(self):
+        self.cells = {}
+        self.hovered = None
+        
+    def register(self, rect, handler, button=None):
+        # Widgets registered first take priority where rects overlap
+        entry = (pygame.Rect(rect), handler, button)
+        cell = self.CELL_SIZE
+        for cx in range(entry[0].left // cell, (entry[0].right - 1) // cell + 1):
+            for cy in range(entry[0].top // cell, (entry[0].bottom - 1) // cell + 1):
+                self.cells.setdefault((cx, cy), []).append(entry)
+                
+    def hits(self, pos):
+        bucket = self.cells.get((pos[0] // self.CELL_SIZE, pos[1] // self.CELL_SIZE), ())
+        return [entry for entry in bucket if entry[0].collidepoint(pos)]
+        
+    def dispatch_click(self, pos):
+        # Returns the (rect, handler, button) entry that claimed the click
+        for entry in self.hits(pos):
+            if entry[1](pos) is not False:
+                return entry
+        return None
+        
+    def update_hover(self, pos):
+        # Returns the buttons whose hover state changed
+        hovered = None
+        for rect, handler, button in self.hits(pos):
+            if button is not None:
+                hovered = button
+                break
+        if hovered is self.hovered:
+            return []
+        changed = [button for button in (self.hovered, hovered) if button is not None]
+        if self.hovered is not None:
+            self.hovered.is_hovered = False
+        if hovered is not None:
+            hovered.is_hovered = True
+        self.hovered = hovered
+        return changed
+
+# Per-phase frame timing for the on-screen HUD and trace files. A trace
+# ending in .json uses the Chrome trace event format (chrome://tracing,
+# Perfetto); anything else is written as CSV with one row per frame.
+class FrameProfiler:
+    PHASES = ("events", "background", "diagram", "wounds", "buttons", "text", "hud", "present", "idle")
+    
+    def __init__(self, trace_path=None, window=120):
+        self.history = {phase: deque(maxlen=window) for phase in self.PHASES}
+        self.frame_times = deque(maxlen=window)
+        self.spans = []
+        self.origin = self.frame_start = self.last = time.perf_counter()
+        self.frame = 0
+        self.trace = None
+        if trace_path:
+            self.trace_json = trace_path.endswith(".json")
+            self.trace = open(trace_path, 'w')
+            if self.trace_json:
+                # The closing bracket is optional in this format, so a crash still leaves a usable trace
+                self.trace.write("[\n")
+            else:
+                self.trace.write("frame,total_ms," + ",".join(f"{phase}_ms" for phase in self.PHASES) + "\n")
+                
+    def begin_frame(self):
+        self.frame_start = self.last = time.perf_counter()
+        self.spans = []
+        
+    def mark(self, phase):
+        # Charge the time since the previous mark to phase
+        now = time.perf_counter()
+        self.spans.append((phase, self.last, now))
+        self.last = now
         
-    def check_hover(self, pos):
-        self.is_hovered = self.rect.collidepoint(pos)
+    def end_frame(self):
+        totals = dict.fromkeys(self.PHASES, 0.0)
+        for phase, start, end in self.spans:
+            totals[phase] += (end - start) * 1000
+        for phase, ms in totals.items():
+            self.history[phase].append(ms)
+        frame_ms = (self.last - self.frame_start) * 1000
+        self.frame_times.append(frame_ms)
         
-    def is_clicked(self, pos, event):
-        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-            return self.rect.collidepoint(pos)
-        return False
+        if self.trace:
+            if self.trace_json:
+                for phase, start, end in self.spans:
+                    self.trace.write(json.dumps({"name": phase, "ph": "X", "pid": 1, "tid": 1,
+                                                 "ts": round((start - self.origin) * 1e6, 1),
+                                                 "dur": round((end - start) * 1e6, 1),
+                                                 "args": {"frame": self.frame}}) + ",\n")
+            else:
+                self.trace.write(f"{self.frame},{frame_ms:.3f}," +
+                                 ",".join(f"{totals[phase]:.3f}" for phase in self.PHASES) + "\n")
+        self.frame += 1
+        
+    def average(self, phase=None):
+        samples = self.frame_times if phase is None else self.history[phase]
+        return sum(samples) / len(samples) if samples else 0.0
+        
+    def close(self):
+        if self.trace:
+            if self.trace_json:
+                self.trace.write("{}]\n")
+            self.trace.close()
+            self.trace = None
 
 class Wound:
     def __init__(self, wound_type, position, size=40):
@@ -227,6 +1120,11 @@ class Wound:
         self.position = position
         self.size = size
         
+    def get_rect(self):
+        # Area touched when the wound is drawn
+        return pygame.Rect(self.position[0] - self.size - 1, self.position[1] - self.size - 1,
+                           self.size * 2 + 3, self.size * 2 + 3)
+        
     def draw(self, surface, wound_images):
         if self.wound_type == "AMPUTATION":
             # Draw a circle with an X for amputation
@@ -240,29 +1138,723 @@ class Wound:
         elif self.wound_type in wound_images and wound_images[self.wound_type]:
             # Draw the wound image at the correct size
             img = wound_images[self.wound_type]
-            scaled_img = pygame.transform.scale(img, (self.size * 2, self.size * 2))
+            scaled_img = wound_sprites.scaled(self.wound_type, self.size, img)
             img_rect = scaled_img.get_rect(center=self.position)
-            surface.blit(scaled_img, img_rect)
+            surface.blit(scaled_img, img_rect, special_flags=pygame.BLEND_PREMULTIPLIED)
         else:
             # Fallback to colored circle if image not available
             pygame.draw.circle(surface, WOUND_COLORS.get(self.wound_type, NEON_PINK), self.position, self.size)
 
+# Area where an erase click removes a wound (within size + 5 on both axes)
+def wound_hit_rect(x, y, size):
+    return pygame.Rect(x - size - 4, y - size - 4, size * 2 + 9, size * 2 + 9)
+
+# Running totals over a WoundStore: wounds per type code, wounds per size
+# and the overall total. The store's mutators keep them current, so reading
+# them never scans the wounds. version is unique across all stores and
+# changes with every update, so readers can cache whatever they derive.
+class TraumaStats:
+    versions = itertools.count(1)
+    
+    def __init__(self, types=(), sizes=()):
+        self.type_counts = Counter(types)
+        self.size_counts = Counter(sizes)
+        self.total = sum(self.type_counts.values())
+        self.version = next(self.versions)
+        
+    def added(self, types, sizes):
+        self.type_counts.update(types)
+        self.size_counts.update(sizes)
+        self.total += len(types)
+        self.version = next(self.versions)
+        
+    def removed(self, types, sizes):
+        self.type_counts.subtract(types)
+        self.size_counts.subtract(sizes)
+        # Keep only sizes that are still present
+        self.size_counts = +self.size_counts
+        self.total -= len(types)
+        self.version = next(self.versions)
+        
+    def reset(self):
+        self.type_counts.clear()
+        self.size_counts.clear()
+        self.total = 0
+        self.version = next(self.versions)
+        
+    def copy(self):
+        stats = TraumaStats()
+        stats.type_counts = Counter(self.type_counts)
+        stats.size_counts = Counter(self.size_counts)
+        stats.total = self.total
+        return stats
+
+# Compact struct-of-arrays storage for wound marks. Rows are kept in drawing
+# order; Wound objects are only created as views when a mark is drawn.
+# Erased rows stay in the columns as tombstones (their positions are listed
+# in dead) so an erase never moves the other rows; rows in the public
+# methods skip them, and the columns are compacted once tombstones
+# outnumber the live rows.
+class WoundStore:
+    # Cell size of the grid index used for point and rectangle queries
+    GRID_CELL = 100
+    
+    def __init__(self, records=()):
+        self.type_names = list(WOUND_TYPES)
+        self.type_codes = {name: code for code, name in enumerate(self.type_names)}
+        # Stable ids, increasing with row number, so the grid index survives deletes
+        self.ids = array('Q')
+        self.types = array('B')
+        self.xs = array('i')
+        self.ys = array('i')
+        self.sizes = array('H')
+        # Sorted column positions of erased rows
+        self.dead = []
+        self.next_id = 0
+        self.max_size = MAX_WOUND_SIZE
+        # Grid index: cell -> array of ids, built on first query
+        self.grid = None
+        self.stats = TraumaStats()
+        self.extend(records)
+        
+    def type_code(self, wound_type):
+        code = self.type_codes.get(wound_type)
+        if code is None:
+            # Keep unknown types from saved files so they round-trip
+            code = len(self.type_names)
+            self.type_names.append(wound_type)
+            self.type_codes[wound_type] = code
+        return code
+        
+    def __len__(self):
+        return len(self.types) - len(self.dead)
+        
+    def __iter__(self):
+        names = self.type_names
+        for code, x, y, size in zip(*self.live_columns()):
+            yield Wound(names[code], (x, y), size)
+            
+    def position(self, row):
+        # Column position of a row, skipping the tombstones before it
+        dead = self.dead
+        if not dead or row < dead[0]:
+            return row
+        # Smallest position with row + 1 live entries up to and including it
+        low, high = row, row + len(dead)
+        while low < high:
+            middle = (low + high) // 2
+            if middle + 1 - bisect_right(dead, middle) <= row:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+        
+    def row_of(self, position):
+        # Row of a live column position
+        return position - bisect_left(self.dead, position)
+        
+    def wound(self, row):
+        position = self.position(row)
+        return Wound(self.type_names[self.types[position]], (self.xs[position], self.ys[position]), self.sizes[position])
+        
+    def record(self, row):
+        return self.record_at(self.position(row))
+        
+    def record_at(self, position):
+        return (self.type_names[self.types[position]], self.xs[position], self.ys[position], self.sizes[position])
+        
+    def wound_id(self, row):
+        return self.ids[self.position(row)]
+        
+    def records(self):
+        names = self.type_names
+        return [(names[code], x, y, size) for code, x, y, size in zip(*self.live_columns())]
+        
+    def live_columns(self):
+        # (types, xs, ys, sizes) without the tombstones, for bulk readers
+        if not self.dead:
+            return self.types, self.xs, self.ys, self.sizes
+        keep = self.keep_mask()
+        return tuple(array(column.typecode, itertools.compress(column, keep))
+                     for column in (self.types, self.xs, self.ys, self.sizes))
+                     
+    def keep_mask(self):
+        keep = bytearray(b"\x01") * len(self.types)
+        for position in self.dead:
+            keep[position] = 0
+        return keep
+        
+    def append(self, wound_type, position, size):
+        self.extend([(wound_type, position[0], position[1], size)])
+        
+    def extend(self, records):
+        # Bulk append of (wound type, x, y, size) records
+        records = list(records)
+        if not records:
+            return
+        wound_types, xs, ys, sizes = zip(*records)
+        start = len(self.types)
+        self.ids.extend(range(self.next_id, self.next_id + len(records)))
+        self.next_id += len(records)
+        self.types.extend(map(self.type_code, wound_types))
+        self.xs.extend(xs)
+        self.ys.extend(ys)
+        self.sizes.extend(sizes)
+        self.max_size = max(self.max_size, max(sizes))
+        self.stats.added(self.types[start:], sizes)
+        if self.grid is not None:
+            for row in range(start, len(self.types)):
+                self.grid_add(row)
+                
+    def delete_rows(self, rows):
+        # Tombstone the given rows and return their records
+        positions = [self.position(row) for row in rows]
+        removed = [self.record_at(position) for position in positions]
+        for position in positions:
+            if self.grid is not None:
+                self.grid_remove(position)
+            insort(self.dead, position)
+        self.stats.removed([self.types[position] for position in positions],
+                           [self.sizes[position] for position in positions])
+        if len(self.dead) * 2 > len(self.types):
+            self.compact()
+        return removed
+        
+    def compact(self):
+        # Drop the tombstones from the columns; ids and the grid stay valid
+        if not self.dead:
+            return
+        keep = self.keep_mask()
+        self.ids = array('Q', itertools.compress(self.ids, keep))
+        self.types = array('B', itertools.compress(self.types, keep))
+        self.xs = array('i', itertools.compress(self.xs, keep))
+        self.ys = array('i', itertools.compress(self.ys, keep))
+        self.sizes = array('H', itertools.compress(self.sizes, keep))
+        self.dead = []
+        
+    def insert(self, rows, records, ids=None):
+        # Put records back at the given rows (ascending positions in the
+        # result), e.g. to undo an erase. With the erased ids the id order
+        # still follows the rows; without them every row is renumbered.
+        records = list(records)
+        if not records:
+            return
+        if ids and self.revive(ids):
+            return
+        self.compact()
+        for i, (row, (wound_type, x, y, size)) in enumerate(zip(rows, records)):
+            self.ids.insert(row, ids[i] if ids else 0)
+            self.types.insert(row, self.type_code(wound_type))
+            self.xs.insert(row, x)
+            self.ys.insert(row, y)
+            self.sizes.insert(row, size)
+        sizes = [record[3] for record in records]
+        self.max_size = max(self.max_size, max(sizes))
+        self.stats.added([self.types[row] for row in rows], sizes)
+        if ids is None:
+            self.ids = array('Q', range(len(self.types)))
+            self.next_id = len(self.types)
+            self.grid = None
+        elif self.grid is not None:
+            for row in rows:
+                self.grid_add(row)
+                
+    def revive(self, ids):
+        # Undo an erase whose rows are all still tombstones; returns whether it could
+        positions = [bisect_left(self.ids, wound_id) for wound_id in ids]
+        indexes = [bisect_left(self.dead, position) for position in positions]
+        if not all(index < len(self.dead) and self.dead[index] == position
+                   for index, position in zip(indexes, positions)):
+            return False
+        for position in reversed(positions):
+            del self.dead[bisect_left(self.dead, position)]
+            if self.grid is not None:
+                self.grid_add(position)
+        self.stats.added([self.types[position] for position in positions],
+                         [self.sizes[position] for position in positions])
+        return True
+        
+    def clear(self):
+        self.ids = array('Q')
+        self.types = array('B')
+        self.xs = array('i')
+        self.ys = array('i')
+        self.sizes = array('H')
+        self.dead = []
+        self.grid = None
+        self.stats.reset()
+        
+    def copy(self):
+        store = WoundStore()
+        store.type_names = list(self.type_names)
+        store.type_codes = dict(self.type_codes)
+        store.ids = array('Q', self.ids)
+        store.types = array('B', self.types)
+        store.xs = array('i', self.xs)
+        store.ys = array('i', self.ys)
+        store.sizes = array('H', self.sizes)
+        store.dead = list(self.dead)
+        store.next_id = self.next_id
+        store.max_size = self.max_size
+        store.stats = self.stats.copy()
+        return store
+        
+    # Statistics, read from the running totals in self.stats
+    def count_by_type(self):
+        counts = self.stats.type_counts
+        return {name: counts[code] for code, name in enumerate(self.type_names)}
+        
+    def size_histogram(self):
+        return dict(sorted(self.stats.size_counts.items()))
+        
+    def summary(self):
+        # Plain data for files and exports
+        return {
+            "total": self.stats.total,
+            "by_type": {name: count for name, count in self.count_by_type().items() if count},
+            "sizes": self.size_histogram()
+        }
+        
+    def nbytes(self):
+        return sum(column.itemsize * len(column)
+                   for column in (self.ids, self.types, self.xs, self.ys, self.sizes))
+        
+    def to_dicts(self):
+        names = self.type_names
+        return [{"type": names[code], "position": [x, y], "size": size}
+                for code, x, y, size in zip(*self.live_columns())]
+        
+    @classmethod
+    def from_columns(cls, type_names, types, xs, ys, sizes):
+        # Bulk construction from whole columns, e.g. a binary session file
+        store = cls()
+        store.type_names = list(type_names)
+        store.type_codes = {name: code for code, name in enumerate(store.type_names)}
+        for name in WOUND_TYPES:
+            store.type_code(name)
+        store.types = array('B', types)
+        store.xs = array('i', xs)
+        store.ys = array('i', ys)
+        store.sizes = array('H', sizes)
+        store.ids = array('Q', range(len(store.types)))
+        store.next_id = len(store.types)
+        store.max_size = max(store.max_size, max(store.sizes, default=0))
+        store.stats = TraumaStats(store.types, store.sizes)
+        return store
+        
+    @classmethod
+    def from_dicts(cls, items):
+        return cls((item["type"], int(item["position"][0]), int(item["position"][1]), int(item["size"]))
+                   for item in items)
+        
+    # The grid and candidate_positions work on column positions; tombstones
+    # are never in the grid
+    def grid_key(self, position):
+        return self.xs[position] // self.GRID_CELL, self.ys[position] // self.GRID_CELL
+        
+    def grid_add(self, position):
+        key = self.grid_key(position)
+        bucket = self.grid.get(key)
+        if bucket is None:
+            bucket = self.grid[key] = array('Q')
+        bucket.append(self.ids[position])
+        
+    def grid_remove(self, position):
+        key = self.grid_key(position)
+        bucket = self.grid[key]
+        bucket.remove(self.ids[position])
+        if not bucket:
+            del self.grid[key]
+            
+    def candidate_positions(self, rect):
+        # Column positions of wounds close enough to rect to touch it
+        if self.grid is None:
+            self.grid = {}
+            dead = set(self.dead)
+            for position in range(len(self.types)):
+                if position not in dead:
+                    self.grid_add(position)
+        reach = self.max_size + 5
+        cell = self.GRID_CELL
+        positions = []
+        for cx in range((rect.left - reach) // cell, (rect.right + reach) // cell + 1):
+            for cy in range((rect.top - reach) // cell, (rect.bottom + reach) // cell + 1):
+                bucket = self.grid.get((cx, cy))
+                if bucket:
+                    positions.extend(bisect_left(self.ids, wound_id) for wound_id in bucket)
+        positions.sort()
+        return positions
+        
+    def rows_at(self, pos):
+        # Rows an erase click at pos would remove, in drawing order
+        px, py = pos
+        rows = []
+        for position in self.candidate_positions(pygame.Rect(px, py, 1, 1)):
+            reach = self.sizes[position] + 5
+            if abs(self.xs[position] - px) < reach and abs(self.ys[position] - py) < reach:
+                rows.append(self.row_of(position))
+        return rows
+        
+    def rows_in(self, rect):
+        # Rows whose hit area overlaps rect, in drawing order
+        rect = pygame.Rect(rect)
+        return [self.row_of(position) for position in self.candidate_positions(rect)
+                if wound_hit_rect(self.xs[position], self.ys[position], self.sizes[position]).colliderect(rect)]
+
+# Undo and redo stacks of compact change records: the wounds an add or
+# erase touched (with their rows and ids), the store a clear or load swapped
+# out, or the previous diagram. Undo and redo therefore cost as much as the
+# change did, not as much as the session. Once the entries together take
+# more than memory_cap bytes the oldest ones are dropped.
+class History:
+    def __init__(self, memory_cap=HISTORY_MEMORY_CAP):
+        self.memory_cap = memory_cap
+        self.undo_stack = deque()
+        self.redo_stack = deque()
+        self.nbytes = 0
+        
+    def entry_size(self, entry):
+        wounds = entry.get("wounds")
+        if isinstance(wounds, WoundStore):
+            return 64 + wounds.nbytes()
+        # A record tuple with its row and id
+        return 64 + 120 * len(wounds or ())
+        
+    def push(self, entry):
+        # A new change makes everything that was undone unreachable
+        while self.redo_stack:
+            self.nbytes -= self.redo_stack.pop()["nbytes"]
+        self.undo_stack.append(entry)
+        self.add_size(entry)
+        self.trim()
+        
+    def add_size(self, entry):
+        entry["nbytes"] = self.entry_size(entry)
+        self.nbytes += entry["nbytes"]
+        
+    def trim(self):
+        while self.nbytes > self.memory_cap and len(self.undo_stack) > 1:
+            self.nbytes -= self.undo_stack.popleft()["nbytes"]
+        while self.nbytes > self.memory_cap and self.redo_stack:
+            self.nbytes -= self.redo_stack.popleft()["nbytes"]
+            
+    def undo(self, apply):
+        # apply(entry, undo) reverts the entry and leaves in it what redo needs
+        return self.move(self.undo_stack, self.redo_stack, apply, True)
+        
+    def redo(self, apply):
+        return self.move(self.redo_stack, self.undo_stack, apply, False)
+        
+    def move(self, source, target, apply, undo):
+        if not source:
+            return None
+        entry = source.pop()
+        self.nbytes -= entry["nbytes"]
+        apply(entry, undo)
+        target.append(entry)
+        self.add_size(entry)
+        self.trim()
+        return entry
+        
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.nbytes = 0
+
+# Wound density of one diagram as a NumPy grid indexed [x, y], built up from
+# any number of sessions a chunk at a time. Wounds are kept in screen
+# coordinates, so the grid covers the diagram at its windowed size. NumPy is
+# optional and slow to import, so it is only imported once a heatmap is built.
+class Heatmap:
+    def __init__(self, size=DIAGRAM_SIZE, cell=HEATMAP_CELL):
+        import numpy as np
+        self.cell = cell
+        self.shape = (-(-size[0] // cell), -(-size[1] // cell))
+        self.density = np.zeros(self.shape)
+        self.wound_count = 0
+        
+    def add_columns(self, weights, xs, ys, sizes):
+        # Accumulate one chunk of wounds given as NumPy columns
+        import numpy as np
+        width, height = self.shape
+        cx = xs // self.cell
+        cy = ys // self.cell
+        inside = (cx >= 0) & (cx < width) & (cy >= 0) & (cy < height)
+        cells = cx[inside] * height + cy[inside]
+        values = weights[inside] * sizes[inside] / 40
+        self.density += np.bincount(cells, values, width * height).reshape(self.shape)
+        self.wound_count += int(inside.sum())
+        
+    def add_store(self, wounds):
+        # Read the store's columns in place, without building Wound objects
+        import numpy as np
+        type_weights = np.array([HEATMAP_TYPE_WEIGHTS.get(name, 1.0) for name in wounds.type_names])
+        types, xs, ys, sizes = wounds.live_columns()
+        types = np.frombuffer(types, dtype=np.uint8)
+        xs = np.frombuffer(xs, dtype=np.int32)
+        ys = np.frombuffer(ys, dtype=np.int32)
+        sizes = np.frombuffer(sizes, dtype=np.uint16)
+        for start in range(0, len(types), HEATMAP_CHUNK):
+            end = start + HEATMAP_CHUNK
+            self.add_columns(type_weights[types[start:end]], xs[start:end], ys[start:end], sizes[start:end])
+            
+    def add_records(self, records):
+        # One chunk of (type, x, y, size) records, e.g. rows from the archive
+        import numpy as np
+        if not records:
+            return
+        wound_types, xs, ys, sizes = zip(*records)
+        weights = np.array([HEATMAP_TYPE_WEIGHTS.get(wound_type, 1.0) for wound_type in wound_types])
+        self.add_columns(weights, np.array(xs), np.array(ys), np.array(sizes, dtype=np.float64))
+        
+    def blurred(self, sigma=HEATMAP_SIGMA):
+        # Gaussian blur as two 1D passes, one per axis
+        import numpy as np
+        radius = int(3 * sigma)
+        taps = np.exp(-0.5 * (np.arange(-radius, radius + 1) / sigma) ** 2)
+        taps /= taps.sum()
+        result = self.density
+        for axis in (0, 1):
+            padded = np.pad(result, [(radius, radius) if a == axis else (0, 0) for a in (0, 1)])
+            length = result.shape[axis]
+            result = sum(tap * padded.take(range(i, i + length), axis=axis) for i, tap in enumerate(taps))
+        return result
+        
+    def surface(self, sigma=HEATMAP_SIGMA):
+        # Colored overlay the size of the diagram; transparent where nothing was hit
+        import numpy as np
+        values = self.blurred(sigma)
+        peak = values.max()
+        if peak > 0:
+            values = values / peak
+        positions = [position for position, _ in HEATMAP_RAMP]
+        overlay = pygame.Surface(self.shape, pygame.SRCALPHA)
+        pixels = pygame.surfarray.pixels3d(overlay)
+        for channel in range(3):
+            pixels[..., channel] = np.interp(values, positions, [color[channel] for _, color in HEATMAP_RAMP])
+        del pixels
+        alpha = pygame.surfarray.pixels_alpha(overlay)
+        alpha[...] = np.sqrt(values) * HEATMAP_ALPHA
+        del alpha
+        return pygame.transform.smoothscale(overlay, (self.shape[0] * self.cell, self.shape[1] * self.cell))
+
+# Function to split "host:port" into a (host, port) pair; a bare number is
+# a port and a bare name is a host
+def parse_address(address, default_host):
+    if ":" in address:
+        host, port = address.rsplit(":", 1)
+        return host or default_host, int(port)
+    if address.isdigit():
+        return default_host, int(address)
+    return address, SYNC_PORT
+
+# Serves the session to viewers as newline-delimited JSON: a snapshot when a
+# viewer connects, then the journal's change records, one message per frame
+# that changed something. The server applies the changes to its own copy of
+# the session, so a late joiner's snapshot never reads the app's store from
+# this thread. It runs an asyncio loop on a background thread; asyncio is
+# imported where it is used, so launches without sync never load it.
+class SyncServer:
+    def __init__(self, host, port, diagram, wounds):
+        import asyncio
+        self.host = host
+        self.port = port
+        self.diagram = diagram
+        self.wounds = wounds
+        self.writers = set()
+        self.server = None
+        self.error = None
+        self.loop = asyncio.new_event_loop()
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self.work, name="sync-server", daemon=True)
+        
+    def start(self):
+        # Returns once the socket is listening; port 0 picks a free port
+        self.thread.start()
+        self.ready.wait()
+        if self.error is not None:
+            raise self.error
+            
+    def work(self):
+        import asyncio
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.server = self.loop.run_until_complete(
+                asyncio.start_server(self.handle_viewer, self.host, self.port))
+            self.port = self.server.sockets[0].getsockname()[1]
+        except OSError as e:
+            self.error = e
+        self.ready.set()
+        if self.error is None:
+            self.loop.run_forever()
+            # Closing a viewer's connection ends its handler
+            self.server.close()
+            for writer in self.writers:
+                writer.close()
+            self.loop.run_until_complete(asyncio.gather(*asyncio.all_tasks(self.loop), return_exceptions=True))
+        self.loop.close()
+        
+    async def handle_viewer(self, reader, writer):
+        # Broadcasts run on this loop too, so nothing can come between the
+        # snapshot and the viewer joining the broadcast
+        writer.write(self.encode({"type": "snapshot", "diagram": self.diagram, "wounds": self.wounds.records()}))
+        self.writers.add(writer)
+        try:
+            # Viewers send nothing; this returns when they disconnect
+            await reader.read()
+        except ConnectionError:
+            pass
+        finally:
+            self.writers.discard(writer)
+            writer.close()
+            
+    def encode(self, message):
+        return (json.dumps(message, separators=(',', ':')) + "\n").encode()
+        
+    def publish(self, changes):
+        # Called by the frame loop with the changes of one frame
+        self.loop.call_soon_threadsafe(self.broadcast, changes)
+        
+    def broadcast(self, changes):
+        for change in changes:
+            self.diagram = apply_change(self.diagram, self.wounds, change)
+        line = self.encode({"type": "changes", "changes": changes})
+        for writer in list(self.writers):
+            if writer.transport.get_write_buffer_size() > SYNC_MAX_BUFFER:
+                # Too far behind to catch up; it gets a new snapshot when it reconnects
+                self.writers.discard(writer)
+                writer.close()
+            else:
+                writer.write(line)
+                
+    def stop(self):
+        if self.thread.is_alive():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+
+# Follows a SyncServer and posts every message it sends as a SYNC_EVENT for
+# the frame loop to apply. A lost connection is posted as a "disconnected"
+# message and retried; the server starts the new connection with a snapshot.
+class SyncClient:
+    def __init__(self, host, port):
+        import asyncio
+        self.host = host
+        self.port = port
+        self.loop = asyncio.new_event_loop()
+        self.task = None
+        self.thread = threading.Thread(target=self.work, name="sync-client", daemon=True)
+        
+    def start(self):
+        self.task = self.loop.create_task(self.follow())
+        self.thread.start()
+        
+    def work(self):
+        import asyncio
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self.task)
+        except asyncio.CancelledError:
+            pass
+        self.loop.close()
+        
+    async def follow(self):
+        import asyncio
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port, limit=SYNC_LINE_LIMIT)
+            except OSError as e:
+                self.post({"type": "disconnected", "error": str(e)})
+                await asyncio.sleep(SYNC_RETRY_DELAY)
+                continue
+            error = None
+            try:
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    self.post(json.loads(line))
+            except (OSError, ValueError) as e:
+                error = str(e)
+            finally:
+                writer.close()
+            self.post({"type": "disconnected", "error": error})
+            await asyncio.sleep(SYNC_RETRY_DELAY)
+            
+    def post(self, message):
+        pygame.event.post(pygame.event.Event(SYNC_EVENT, message=message))
+        
+    def stop(self):
+        if self.thread.is_alive():
+            self.loop.call_soon_threadsafe(self.task.cancel)
+            self.thread.join()
+
 class App:
-    def __init__(self):
+    def __init__(self, fps_cap=FPS_CAP, low_power=False, profile=False, trace_path=None,
+                 history_cap=HISTORY_MEMORY_CAP, serve=None, connect=None, data_file=None):
         self.current_diagram = "MALE FRONT"
-        self.wounds = []
+        self.wounds = WoundStore()
         self.selected_wound_type = "LACERATION"
         self.wound_size = 40
         self.fullscreen = False
         
-        # Load diagram and wound images
-        self.diagram_images, self.wound_images = load_images()
+        # Load saved data; later saves and loads run on the I/O worker. The
+        # data file's extension picks the format. A sync viewer shows the
+        # host's session instead and keeps no files.
+        self.data_file = data_file or DATA_FILE
+        self.io = IOWorker()
+        self.status = "> SYSTEM READY"
+        self.journal = Journal(self.io, self.data_file) if USE_JOURNAL and connect is None else None
+        if connect is None:
+            if self.journal:
+                saved_diagram, saved_wounds = self.journal.load(self.current_diagram)
+                if self.journal.error:
+                    self.status = "> JOURNAL DAMAGED, KEPT AS .BAK FILES"
+            else:
+                saved_diagram, saved_wounds = load_data(self.data_file)
+            if saved_diagram:
+                self.current_diagram = saved_diagram
+                self.wounds = saved_wounds
         
-        # Load saved data
-        saved_diagram, saved_wounds = load_data()
-        if saved_diagram:
-            self.current_diagram = saved_diagram
-            self.wounds = saved_wounds
+        # Live sync: a host publishes its changes once per frame, a viewer
+        # applies what its host publishes
+        self.sync_server = None
+        self.sync_client = None
+        self.sync_pending = []
+        if serve is not None:
+            self.sync_server = SyncServer(*serve, self.current_diagram, self.wounds.copy())
+            self.sync_server.start()
+            self.status = f"> SERVING ON PORT {self.sync_server.port}"
+        elif connect is not None:
+            self.sync_client = SyncClient(*connect)
+            self.sync_client.start()
+            self.status = f"> CONNECTING TO {connect[0]}:{connect[1]}..."
+        
+        # Undo and redo of the changes made in this run
+        self.history = History(history_cap)
+        
+        # Paint mode: a drag stamps wounds along the mouse path (the stroke),
+        # committed as one change when the button is released
+        self.paint_mode = False
+        self.stroke = None
+        self.stroke_pos = None
+        self.stroke_gap = 0.0
+        
+        # Heatmap overlay of the archived sessions on the current diagram;
+        # heatmap_diagram is the diagram it was last requested for
+        self.show_heatmap = False
+        self.heatmap_diagram = None
+        self.heatmap_surface = None
+        
+        # Archive of named sessions, browsed in place of the stats panel
+        self.store = SessionStore()
+        self.browsing = False
+        self.session_list = []
+        self.session_scroll = 0
+        
+        # Load diagram and wound images; the other diagrams are only decoded
+        # once the diagram is switched
+        self.assets = AssetManager()
+        self.diagram_images, self.wound_images = load_images(self.assets, self.current_diagram)
         
         # Calculate layout dimensions
         self.diagram_width = 800
@@ -273,7 +1865,482 @@ class App:
         
         # Create UI elements
         self.create_ui_elements()
+        self.background = self.render_background()
+        
+        # Wounds are drawn once onto a persistent layer over the diagram
+        self.create_wound_layer()
+        
+        # Render loop settings. Low-power mode stops the scan line animation
+        # so the loop can sleep until there is input.
+        self.fps_cap = fps_cap
+        self.low_power = low_power
+        self.dirty_rects = []
+        self.full_redraw = True
+        self.scan_y = None
+        self.scan_line = pygame.Surface((SCREEN_WIDTH, 1), pygame.SRCALPHA)
+        self.scan_line.fill((NEON_BLUE[0], NEON_BLUE[1], NEON_BLUE[2], 30))
+        
+        # Frame profiler; None unless the HUD is shown or a trace is written
+        self.show_hud = profile
+        self.trace_path = trace_path
+        self.profiler = FrameProfiler(trace_path) if profile or trace_path else None
+        self.hud_rect = pygame.Rect(10, 10, 240, 28 + 18 * len(FrameProfiler.PHASES))
+        
+    def toggle_hud(self):
+        self.show_hud = not self.show_hud
+        if self.show_hud and self.profiler is None:
+            self.profiler = FrameProfiler()
+        elif not self.show_hud and not self.trace_path:
+            self.profiler = None
+        self.mark_dirty(self.hud_rect)
+        
+    def draw_hud(self):
+        profiler = self.profiler
+        frame_ms = profiler.average()
+        hud = pygame.Surface(self.hud_rect.size, pygame.SRCALPHA)
+        hud.fill((0, 0, 0, 190))
+        pygame.draw.rect(hud, NEON_GREEN, hud.get_rect(), 1)
+        fps = 1000 / frame_ms if frame_ms else 0
+        hud.blit(small_font.render(f"FRAME {frame_ms:6.2f} ms  {fps:5.0f} FPS", True, NEON_GREEN), (8, 6))
+        y = 26
+        for phase in FrameProfiler.PHASES:
+            hud.blit(small_font.render(f"{phase.upper():<12}{profiler.average(phase):7.2f}", True, TEXT_COLOR), (8, y))
+            y += 18
+        screen.blit(hud, self.hud_rect.topleft)
+        
+    def mark_dirty(self, rect=None):
+        # Queue a screen area for redrawing; no rect means the whole screen
+        if rect is None:
+            self.full_redraw = True
+        else:
+            self.dirty_rects.append(pygame.Rect(rect))
+            
+    def mark_button_dirty(self, button):
+        self.mark_dirty(button.rect.inflate(2 * Button.FACE_MARGIN, 2 * Button.FACE_MARGIN))
+        
+    def set_status(self, status):
+        self.status = status
+        self.mark_dirty(self.readout_rect)
+        
+    def create_wound_layer(self):
+        self.wound_layer = pygame.Surface((self.diagram_width, SCREEN_HEIGHT), pygame.SRCALPHA)
+        self.redraw_wound_layer()
         
+    def redraw_wound_layer(self, region=None):
+        # Rebuild the whole layer, or only the given region of it
+        if region is None:
+            self.wound_layer.fill((0, 0, 0, 0))
+            for wound in self.wounds:
+                wound.draw(self.wound_layer, self.wound_images)
+            return
+        
+        region = region.clip(self.wound_layer.get_rect())
+        if not region:
+            return
+        self.wound_layer.fill((0, 0, 0, 0), region)
+        self.wound_layer.set_clip(region)
+        for wound in self.wounds_in(region):
+            wound.draw(self.wound_layer, self.wound_images)
+        self.wound_layer.set_clip(None)
+        
+    def wounds_in(self, rect):
+        # Wounds whose hit area overlaps rect, in drawing order
+        return [self.wounds.wound(row) for row in self.wounds.rows_in(rect)]
+        
+    def record_change(self, change):
+        # Every change to the session passes through here
+        self.mark_dirty(self.stats_area)
+        if self.sync_server:
+            self.sync_pending.append(change)
+        if self.journal:
+            if change["op"] == "load":
+                # Compact right away so replay does not decode the session again
+                self.journal.append_load(self.current_diagram, self.wounds)
+                self.journal.snapshot(self.current_diagram, self.wounds)
+                return
+            self.journal.append(change)
+            if self.journal.needs_snapshot():
+                self.journal.snapshot(self.current_diagram, self.wounds)
+                
+    def select_diagram(self, name):
+        # Once diagrams are being switched, decode the rest in the background
+        self.diagram_images.prefetch()
+        if name != self.current_diagram:
+            self.history.push({"op": "diagram", "name": self.current_diagram})
+            self.current_diagram = name
+            self.mark_dirty(self.diagram_rect)
+            self.record_change({"op": "diagram", "name": name})
+            
+    def add_wound(self, wound):
+        self.wounds.append(wound.wound_type, wound.position, wound.size)
+        wound.draw(self.wound_layer, self.wound_images)
+        self.mark_dirty(wound.get_rect().clip(self.diagram_rect))
+        records = [(wound.wound_type, wound.position[0], wound.position[1], wound.size)]
+        self.history.push({"op": "add", "wounds": records})
+        self.record_change({"op": "add", "wounds": records})
+        
+    def erase_at(self, pos):
+        # Remove wounds that are clicked on
+        rows = self.wounds.rows_at(pos)
+        if not rows:
+            return
+        ids = [self.wounds.wound_id(row) for row in rows]
+        records = self.wounds.delete_rows(rows)
+        self.redraw_records(records)
+        self.history.push({"op": "erase", "rows": rows, "wounds": records, "ids": ids})
+        self.record_change({"op": "erase", "rows": rows})
+        
+    def redraw_records(self, records):
+        # Redraw the part of the wound layer the given wounds cover
+        rects = [Wound(wound_type, (x, y), size).get_rect() for wound_type, x, y, size in records]
+        region = rects[0].unionall(rects[1:])
+        self.redraw_wound_layer(region)
+        self.mark_dirty(region.clip(self.diagram_rect))
+        
+    def clear_wounds(self):
+        # The cleared store is kept whole by the history for undo
+        self.history.push({"op": "clear", "diagram": self.current_diagram, "wounds": self.wounds})
+        self.wounds = WoundStore()
+        self.wound_layer.fill((0, 0, 0, 0))
+        self.mark_dirty(self.diagram_rect)
+        self.record_change({"op": "clear"})
+        
+    def handle_sync(self, message):
+        # A message from the host this viewer follows
+        kind = message["type"]
+        if kind == "snapshot":
+            self.current_diagram = message["diagram"]
+            self.set_wounds(WoundStore(message["wounds"]))
+            self.set_status(f"> VIEWING {self.sync_client.host}:{self.sync_client.port}")
+        elif kind == "changes":
+            for change in message["changes"]:
+                self.apply_remote(change)
+        elif kind == "disconnected":
+            self.set_status("> SYNC LOST, RECONNECTING...")
+            
+    def apply_remote(self, change):
+        # The same change records the journal replays, applied with redraws
+        op = change["op"]
+        if op == "add":
+            self.wounds.extend(change["wounds"])
+            if change["wounds"]:
+                self.redraw_records(change["wounds"])
+        elif op == "erase":
+            records = self.wounds.delete_rows(change["rows"])
+            if records:
+                self.redraw_records(records)
+        elif op == "insert":
+            self.wounds.insert(change["rows"], change["wounds"])
+            if change["wounds"]:
+                self.redraw_records(change["wounds"])
+        elif op == "clear":
+            self.wounds.clear()
+            self.wound_layer.fill((0, 0, 0, 0))
+            self.mark_dirty(self.diagram_rect)
+        elif op == "load":
+            self.current_diagram = change["diagram"]
+            self.set_wounds(WoundStore(change["wounds"]))
+        elif op == "diagram":
+            self.current_diagram = change["name"]
+            self.mark_dirty(self.diagram_rect)
+        self.mark_dirty(self.stats_area)
+        
+    def flush_sync(self):
+        # Publish this frame's changes as one message
+        if self.sync_pending:
+            self.sync_server.publish(self.sync_pending)
+            self.sync_pending = []
+            
+    def undo(self):
+        self.end_stroke()
+        entry = self.history.undo(self.apply_history)
+        self.set_status(f"> UNDO {entry['op'].upper()}" if entry else "> NOTHING TO UNDO")
+        
+    def redo(self):
+        self.end_stroke()
+        entry = self.history.redo(self.apply_history)
+        self.set_status(f"> REDO {entry['op'].upper()}" if entry else "> NOTHING TO REDO")
+        
+    def apply_history(self, entry, undo):
+        # Revert (undo) or repeat a history entry, journaling the result as
+        # an ordinary change. Clear and load entries swap the stored session
+        # with the current one, so the same entry serves undo and redo.
+        op = entry["op"]
+        if op == "add" and undo:
+            count = len(self.wounds)
+            rows = list(range(count - len(entry["wounds"]), count))
+            self.wounds.delete_rows(rows)
+            self.redraw_records(entry["wounds"])
+            self.record_change({"op": "erase", "rows": rows})
+        elif op == "add":
+            self.wounds.extend(entry["wounds"])
+            self.redraw_records(entry["wounds"])
+            self.record_change({"op": "add", "wounds": entry["wounds"]})
+        elif op == "erase" and undo:
+            self.wounds.insert(entry["rows"], entry["wounds"], entry["ids"])
+            self.redraw_records(entry["wounds"])
+            self.record_change({"op": "insert", "rows": entry["rows"], "wounds": entry["wounds"]})
+        elif op == "erase":
+            entry["ids"] = [self.wounds.wound_id(row) for row in entry["rows"]]
+            self.wounds.delete_rows(entry["rows"])
+            self.redraw_records(entry["wounds"])
+            self.record_change({"op": "erase", "rows": entry["rows"]})
+        elif op in ("clear", "load"):
+            diagram, wounds = entry["diagram"], entry["wounds"]
+            entry["diagram"], entry["wounds"] = self.current_diagram, self.wounds
+            self.current_diagram = diagram
+            self.set_wounds(wounds)
+            self.record_change({"op": "load", "diagram": diagram, "wounds": wounds.records()})
+        elif op == "diagram":
+            name = entry["name"]
+            entry["name"] = self.current_diagram
+            self.current_diagram = name
+            self.mark_dirty(self.diagram_rect)
+            self.record_change({"op": "diagram", "name": name})
+            
+    def set_wounds(self, wounds):
+        self.wounds = wounds
+        self.redraw_wound_layer()
+        self.mark_dirty(self.diagram_rect)
+        self.mark_dirty(self.stats_area)
+        
+    def save_session(self):
+        # Write a copy so later edits cannot race the worker
+        self.set_status("> SAVING...")
+        self.io.submit("save", self.write_data, self.current_diagram, self.wounds.copy())
+            
+    def write_data(self, diagram, wounds):
+        write_session(self.data_file, diagram, wounds)
+        return self.data_file
+        
+    def load_session(self):
+        # Back to what SAVE or the last quit wrote; the journal only
+        # restores a session at startup
+        self.set_status("> LOADING...")
+        self.io.submit("load", self.read_data)
+        
+    def read_data(self):
+        # A missing data file is nothing to load rather than a failure
+        if not os.path.exists(self.data_file):
+            return None, None, None
+        return read_session(self.data_file)
+            
+    def apply_loaded(self, diagram, wounds):
+        self.end_stroke()
+        self.history.push({"op": "load", "diagram": self.current_diagram, "wounds": self.wounds})
+        self.current_diagram = diagram
+        self.set_wounds(wounds)
+        self.record_change({"op": "load", "diagram": diagram, "wounds": wounds.records()})
+        
+    def handle_io_done(self, event):
+        # Completion or failure of a job on the I/O worker
+        if event.error is not None:
+            self.set_status(f"> {event.kind.upper()} FAILED: {event.error}")
+            print(f"{event.kind} failed: {event.error}")
+        elif event.kind == "load":
+            diagram, wounds = event.result[:2]
+            if diagram:
+                self.apply_loaded(diagram, wounds)
+                self.set_status(f"> LOADED {len(wounds)} TRAUMAS")
+            else:
+                self.set_status("> NOTHING TO LOAD")
+        elif event.kind == "save":
+            self.set_status(f"> SAVED TO {event.result}")
+            print(f"Data saved to {event.result}")
+        elif event.kind == "archive":
+            self.set_status(f"> ARCHIVED AS {event.result}")
+            if self.browsing:
+                self.io.submit("sessions", self.store.list_sessions)
+            if self.show_heatmap:
+                self.heatmap_diagram = None
+                self.mark_dirty(self.diagram_rect)
+        elif event.kind == "heatmap":
+            diagram, heatmap = event.result
+            # Drop results for a diagram that is no longer shown
+            if self.show_heatmap and diagram == self.heatmap_diagram:
+                self.heatmap_surface = heatmap.surface()
+                self.mark_dirty(self.diagram_rect)
+                self.set_status(f"> HEATMAP OF {heatmap.wound_count} ARCHIVED TRAUMAS")
+        elif event.kind == "sessions":
+            self.session_list = event.result
+            self.scroll_sessions(0)
+            
+    def flush_io(self):
+        # Write the session one last time and wait for all pending I/O
+        self.end_stroke()
+        if self.sync_server:
+            self.sync_server.stop()
+        if self.sync_client:
+            self.sync_client.stop()
+        else:
+            self.io.submit("save", self.write_data, self.current_diagram, self.wounds.copy())
+            # Snapshot after the data file so the next start keeps using the journal
+            if self.journal:
+                self.journal.snapshot(self.current_diagram, self.wounds)
+        # The archive's connection belongs to the worker thread
+        self.io.submit("close", self.store.close)
+        self.io.flush()
+        self.io.stop()
+        if self.journal:
+            self.journal.close()
+        self.assets.shutdown()
+        
+    def register_handlers(self):
+        # Widgets register their click handlers once per layout
+        self.router = EventRouter()
+        self.router.register(self.archive_button.rect, lambda pos: self.archive_session(), self.archive_button)
+        self.router.register(self.sessions_button.rect, lambda pos: self.toggle_sessions(), self.sessions_button)
+        self.router.register(self.heatmap_button.rect, lambda pos: self.toggle_heatmap(), self.heatmap_button)
+        self.router.register(self.size_up_button.rect, lambda pos: self.change_size(WOUND_SIZE_STEP), self.size_up_button)
+        self.router.register(self.size_down_button.rect, lambda pos: self.change_size(-WOUND_SIZE_STEP), self.size_down_button)
+        self.router.register(self.fullscreen_button.rect, lambda pos: self.toggle_fullscreen(), self.fullscreen_button)
+        # A viewer only watches; nothing that changes the session is clickable
+        if not self.sync_client:
+            self.register_editing_handlers()
+        self.router.update_hover(pygame.mouse.get_pos())
+        
+    def register_editing_handlers(self):
+        for button, diagram_name in zip(self.diagram_buttons, DIAGRAMS):
+            self.router.register(button.rect, lambda pos, name=diagram_name: self.select_diagram(name), button)
+        for button, wound_type in zip(self.wound_buttons, WOUND_TYPES):
+            self.router.register(button.rect, lambda pos, name=wound_type: self.select_wound_type(name), button)
+        self.router.register(self.paint_button.rect, lambda pos: self.toggle_paint(), self.paint_button)
+        self.router.register(self.stats_panel_rect, self.click_session_list)
+        self.router.register(self.clear_button.rect, lambda pos: self.clear_wounds(), self.clear_button)
+        self.router.register(self.save_button.rect, lambda pos: self.save_session(), self.save_button)
+        self.router.register(self.load_button.rect, lambda pos: self.load_session(), self.load_button)
+        self.router.register(self.erase_button.rect, lambda pos: self.toggle_erase(), self.erase_button)
+        self.router.register((0, 0, self.diagram_width, SCREEN_HEIGHT), self.click_diagram)
+        
+    def archive_session(self):
+        # Archive a copy of the session under the current date and time,
+        # never replacing an earlier archive from the same second
+        name = time.strftime("%Y-%m-%d %H:%M:%S")
+        self.set_status("> ARCHIVING...")
+        self.io.submit("archive", self.store.save, name, self.current_diagram, self.wounds.copy(), False)
+        
+    def toggle_sessions(self):
+        self.browsing = not self.browsing
+        self.sessions_button.text = "BACK TO STATS" if self.browsing else "SESSIONS"
+        if self.browsing:
+            self.io.submit("sessions", self.store.list_sessions)
+        self.mark_dirty(self.stats_area)
+        
+    def scroll_sessions(self, step):
+        last = max(0, len(self.session_list) - SESSION_ROWS)
+        self.session_scroll = max(0, min(last, self.session_scroll + step))
+        self.mark_dirty(self.stats_area)
+        
+    def click_session_list(self, pos):
+        # Load the archived session whose row was clicked
+        if not self.browsing:
+            return False
+        row = (pos[1] - self.stats_panel_rect.y - SESSION_LIST_TOP) // SESSION_ROW_HEIGHT
+        index = self.session_scroll + row
+        if 0 <= row < SESSION_ROWS and index < len(self.session_list):
+            name = self.session_list[index][0]
+            self.set_status(f"> LOADING {name}...")
+            self.io.submit("load", self.store.load, name)
+            
+    def select_wound_type(self, wound_type):
+        self.selected_wound_type = wound_type
+        
+    def toggle_heatmap(self):
+        # Only look for NumPy here; the I/O worker imports it with the first heatmap
+        if importlib.util.find_spec("numpy") is None:
+            self.set_status("> HEATMAP NEEDS NUMPY")
+            return
+        self.show_heatmap = not self.show_heatmap
+        self.heatmap_button.text = f"HEATMAP: {'ON' if self.show_heatmap else 'OFF'}"
+        # The overlay is requested again the next time it is drawn
+        self.heatmap_diagram = None
+        self.heatmap_surface = None
+        self.mark_dirty(self.diagram_rect)
+        
+    def request_heatmap(self):
+        self.heatmap_diagram = self.current_diagram
+        self.heatmap_surface = None
+        self.set_status("> BUILDING HEATMAP...")
+        self.io.submit("heatmap", self.build_heatmap, self.current_diagram)
+        
+    def build_heatmap(self, diagram):
+        # Runs on the I/O worker, which owns the archive's connection
+        heatmap = Heatmap()
+        for chunk in self.store.wound_chunks(diagram):
+            heatmap.add_records(chunk)
+        return diagram, heatmap
+        
+    def toggle_paint(self):
+        self.paint_mode = not self.paint_mode
+        self.paint_button.text = f"PAINT: {'ON' if self.paint_mode else 'OFF'}"
+        
+    def toggle_erase(self):
+        self.erase_mode = not self.erase_mode
+        self.erase_button.text = f"ERASE: {'ON' if self.erase_mode else 'OFF'}"
+        
+    def change_size(self, step):
+        self.wound_size = max(MIN_WOUND_SIZE, min(MAX_WOUND_SIZE, self.wound_size + step))
+        self.mark_dirty(self.readout_rect)
+        
+    def click_diagram(self, pos):
+        if self.erase_mode:
+            self.erase_at(pos)
+        elif self.paint_mode:
+            self.begin_stroke(pos)
+        else:
+            # Add a new wound
+            self.add_wound(Wound(self.selected_wound_type, pos, self.wound_size))
+            
+    def handle_motion(self, points):
+        # All mouse motion since the last call, oldest first. Hover only
+        # depends on where the mouse ended up; a stroke follows every point.
+        if not points:
+            return
+        for button in self.router.update_hover(points[-1]):
+            self.mark_button_dirty(button)
+        if self.stroke is not None:
+            self.extend_stroke(points)
+            
+    def begin_stroke(self, pos):
+        self.stroke = []
+        self.stroke_pos = pos
+        self.stroke_gap = 0.0
+        self.stamp(pos)
+        
+    def extend_stroke(self, points):
+        # Resample the mouse path at an even spacing, carrying the distance
+        # since the last stamp over from one segment (and frame) to the next
+        spacing = max(1.0, self.wound_size * STROKE_SPACING)
+        x0, y0 = self.stroke_pos
+        for x1, y1 in points:
+            dx, dy = x1 - x0, y1 - y0
+            length = math.hypot(dx, dy)
+            travelled = 0.0
+            while self.stroke_gap + length - travelled >= spacing:
+                travelled += spacing - self.stroke_gap
+                self.stroke_gap = 0.0
+                self.stamp((round(x0 + dx * travelled / length), round(y0 + dy * travelled / length)))
+            self.stroke_gap += length - travelled
+            x0, y0 = x1, y1
+        self.stroke_pos = (x0, y0)
+        
+    def stamp(self, pos):
+        # Draw one wound of the stroke; it joins the session when the stroke ends
+        if not self.diagram_rect.collidepoint(pos):
+            return
+        wound = Wound(self.selected_wound_type, pos, self.wound_size)
+        wound.draw(self.wound_layer, self.wound_images)
+        self.mark_dirty(wound.get_rect().clip(self.diagram_rect))
+        self.stroke.append((wound.wound_type, pos[0], pos[1], wound.size))
+        
+    def end_stroke(self):
+        # Commit the stroke as a single add
+        stroke, self.stroke = self.stroke, None
+        if stroke:
+            self.wounds.extend(stroke)
+            self.history.push({"op": "add", "wounds": stroke})
+            self.record_change({"op": "add", "wounds": stroke})
+            
     def create_ui_elements(self):
         # Calculate positions based on current layout
         start_x = self.diagram_width + 20
@@ -288,6 +2355,27 @@ class App:
             ))
             y_pos += self.button_height + self.button_margin
             
+        # Create session archive buttons under the diagram buttons
+        self.archive_button = Button(start_x, y_pos, self.button_width, self.button_height,
+                                     "ARCHIVE", BUTTON_COLOR, BUTTON_HOVER, outline_color=NEON_YELLOW)
+        y_pos += self.button_height + self.button_margin
+        self.sessions_button = Button(start_x, y_pos, self.button_width, self.button_height,
+                                      "BACK TO STATS" if self.browsing else "SESSIONS",
+                                      BUTTON_COLOR, BUTTON_HOVER, outline_color=NEON_YELLOW)
+        y_pos += self.button_height + self.button_margin
+        
+        # Create paint mode toggle
+        self.paint_button = Button(start_x, y_pos, self.button_width, self.button_height,
+                                   f"PAINT: {'ON' if self.paint_mode else 'OFF'}",
+                                   BUTTON_COLOR, BUTTON_HOVER, outline_color=NEON_PINK)
+        y_pos += self.button_height + self.button_margin
+        
+        # Create heatmap overlay toggle
+        self.heatmap_button = Button(start_x, y_pos, self.button_width, self.button_height,
+                                     f"HEATMAP: {'ON' if self.show_heatmap else 'OFF'}",
+                                     BUTTON_COLOR, BUTTON_HOVER, outline_color=NEON_BLUE)
+        y_pos += self.button_height + self.button_margin
+            
         # Create wound type selection buttons
         self.wound_buttons = []
         wound_start_x = start_x + self.button_width + 20
@@ -333,34 +2421,54 @@ class App:
         self.fullscreen_button = Button(control_start_x, y_pos, self.button_width, self.button_height, 
                                        "FULLSCREEN", BUTTON_COLOR, BUTTON_HOVER, outline_color=NEON_BLUE)
         
-    def draw_cyberpunk_ui(self):
-        # Draw background
-        screen.fill(BG_COLOR)
+        # Position of the wound size readout and the stats panel below everything
+        self.size_text_pos = (control_start_x, self.fullscreen_button.rect.bottom + 20)
+        stats_panel_y = max(
+            self.heatmap_button.rect.bottom,
+            self.wound_buttons[-1].rect.bottom if self.wound_buttons else 0,
+            self.size_text_pos[1] + 40
+        ) + 30
+        self.stats_panel_rect = pygame.Rect(self.diagram_width + 20, stats_panel_y, self.ui_panel_width - 40, 200)
+        # The panel plus the 30 pixels below its frame that hold the last row of counts
+        self.stats_area = pygame.Rect(self.stats_panel_rect.x, self.stats_panel_rect.y,
+                                      self.stats_panel_rect.width, self.stats_panel_rect.height + 30)
+        # Trauma size readout and the status line below it
+        self.readout_rect = pygame.Rect(self.size_text_pos, (SCREEN_WIDTH - self.size_text_pos[0], 50))
+        self.diagram_rect = pygame.Rect(0, 0, self.diagram_width, SCREEN_HEIGHT)
+        self.stats_surface = None
+        self.stats_key = None
+        
+        self.register_handlers()
+        
+    def render_background(self):
+        # Composite all of the static chrome once; it only changes with the layout
+        background = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert()
+        background.fill(BG_COLOR)
         
         # Draw diagram area with cyberpunk border
-        pygame.draw.rect(screen, DARK_GRAY, (0, 0, self.diagram_width, SCREEN_HEIGHT))
-        pygame.draw.rect(screen, NEON_BLUE, (0, 0, self.diagram_width, SCREEN_HEIGHT), 3)
+        pygame.draw.rect(background, DARK_GRAY, (0, 0, self.diagram_width, SCREEN_HEIGHT))
+        pygame.draw.rect(background, NEON_BLUE, (0, 0, self.diagram_width, SCREEN_HEIGHT), 3)
         
         # Draw UI panel with cyberpunk style
-        pygame.draw.rect(screen, PANEL_COLOR, (self.diagram_width, 0, self.ui_panel_width, SCREEN_HEIGHT))
-        pygame.draw.line(screen, NEON_PURPLE, (self.diagram_width, 0), (self.diagram_width, SCREEN_HEIGHT), 3)
+        pygame.draw.rect(background, PANEL_COLOR, (self.diagram_width, 0, self.ui_panel_width, SCREEN_HEIGHT))
+        pygame.draw.line(background, NEON_PURPLE, (self.diagram_width, 0), (self.diagram_width, SCREEN_HEIGHT), 3)
         
         # Draw cyberpunk grid lines in the background
         for i in range(0, SCREEN_WIDTH, 20):
             alpha = 20 if i % 100 != 0 else 40
             grid_surf = pygame.Surface((1, SCREEN_HEIGHT), pygame.SRCALPHA)
             grid_surf.fill((NEON_BLUE[0], NEON_BLUE[1], NEON_BLUE[2], alpha))
-            screen.blit(grid_surf, (i, 0))
+            background.blit(grid_surf, (i, 0))
             
         for i in range(0, SCREEN_HEIGHT, 20):
             alpha = 20 if i % 100 != 0 else 40
             grid_surf = pygame.Surface((SCREEN_WIDTH, 1), pygame.SRCALPHA)
             grid_surf.fill((NEON_BLUE[0], NEON_BLUE[1], NEON_BLUE[2], alpha))
-            screen.blit(grid_surf, (0, i))
+            background.blit(grid_surf, (0, i))
         
         # Draw title with cyberpunk style
         title = title_font.render("CYBER-AUTOPSY // TraumaScan v2.0.77", True, NEON_BLUE)
-        screen.blit(title, (self.diagram_width + 20, 20))
+        background.blit(title, (self.diagram_width + 20, 20))
         
         # Draw section headers with cyberpunk style
         headers = [
@@ -371,64 +2479,49 @@ class App:
         
         for text, x, y, color in headers:
             header = header_font.render(text, True, color)
-            screen.blit(header, (x, y))
+            background.blit(header, (x, y))
         
-        # Draw the current diagram
-        screen.blit(self.diagram_images[self.current_diagram], (0, 0))
+        return background
         
-        # Draw wounds
-        for wound in self.wounds:
-            wound.draw(screen, self.wound_images)
-            
-        # Draw buttons
-        for button in self.diagram_buttons:
-            button.draw(screen)
-            
-        for button in self.wound_buttons:
-            button.draw(screen)
-            
-        self.clear_button.draw(screen)
-        self.save_button.draw(screen)
-        self.load_button.draw(screen)
-        self.erase_button.draw(screen)
-        self.size_up_button.draw(screen)
-        self.size_down_button.draw(screen)
-        self.fullscreen_button.draw(screen)
+    def render_panel_frame(self):
+        # Draw the panel over a copy of the background it covers
+        area = self.stats_area.clip(self.background.get_rect())
+        panel = self.background.subsurface(area).copy()
+        pygame.draw.rect(panel, DARK_GRAY, (0, 0, self.stats_panel_rect.width, self.stats_panel_rect.height), border_radius=5)
+        pygame.draw.rect(panel, NEON_BLUE, (0, 0, self.stats_panel_rect.width, self.stats_panel_rect.height), 2, border_radius=5)
+        return panel
         
-        # Draw wound size
-        size_text = font.render(f"TRAUMA SIZE: {self.wound_size}", True, NEON_GREEN)
-        size_text_x = self.diagram_width + 20 + 2*(self.button_width + 20)
-        size_text_y = self.fullscreen_button.rect.bottom + 20
-        screen.blit(size_text, (size_text_x, size_text_y))
+    def render_sessions_panel(self):
+        panel = self.render_panel_frame()
+        panel.blit(text_cache.render(header_font, "SESSION ARCHIVE", NEON_PINK), (10, 10))
         
-        # Draw wound statistics in a cyberpunk style panel
-        stats_panel_y = max(
-            self.diagram_buttons[-1].rect.bottom if self.diagram_buttons else 0,
-            self.wound_buttons[-1].rect.bottom if self.wound_buttons else 0,
-            size_text_y + 40
-        ) + 30
+        # One row per session: name, diagram and trauma count
+        visible = self.session_list[self.session_scroll:self.session_scroll + SESSION_ROWS]
+        for row, (name, diagram, wound_count, _) in enumerate(visible):
+            y = SESSION_LIST_TOP + row * SESSION_ROW_HEIGHT
+            panel.blit(font.render(name, True, NEON_BLUE), (10, y))
+            panel.blit(font.render(diagram, True, TEXT_COLOR), (330, y))
+            panel.blit(font.render(f"{wound_count} TRAUMAS", True, NEON_GREEN), (560, y))
+        if not self.session_list:
+            panel.blit(font.render("NO ARCHIVED SESSIONS", True, TEXT_COLOR), (10, SESSION_LIST_TOP))
         
-        # Draw stats panel
-        stats_panel_height = 200
-        pygame.draw.rect(screen, DARK_GRAY, (self.diagram_width + 20, stats_panel_y, 
-                                           self.ui_panel_width - 40, stats_panel_height), border_radius=5)
-        pygame.draw.rect(screen, NEON_BLUE, (self.diagram_width + 20, stats_panel_y, 
-                                           self.ui_panel_width - 40, stats_panel_height), 2, border_radius=5)
+        footer = f"ARCHIVED SESSIONS: {len(self.session_list)}  // CLICK TO LOAD, WHEEL TO SCROLL"
+        panel.blit(font.render(footer, True, NEON_YELLOW), (10, self.stats_panel_rect.height - 30))
+        return panel
         
-        stats_title = header_font.render("TRAUMA ANALYSIS", True, NEON_PINK)
-        screen.blit(stats_title, (self.diagram_width + 30, stats_panel_y + 10))
+    def render_stats_panel(self, wound_counts, total):
+        panel = self.render_panel_frame()
+        stats_panel_height = self.stats_panel_rect.height
         
-        # Count wounds by type
-        wound_counts = defaultdict(int)
-        for wound in self.wounds:
-            wound_counts[wound.wound_type] += 1
+        stats_title = text_cache.render(header_font, "TRAUMA ANALYSIS", NEON_PINK)
+        panel.blit(stats_title, (10, 10))
         
         # Draw stats in columns
-        col1_x = self.diagram_width + 30
+        col1_x = 10
         col2_x = col1_x + 200
         col3_x = col2_x + 200
         
-        stats_y = stats_panel_y + 50
+        stats_y = 50
         col = 1
         for i, wound_type in enumerate(WOUND_TYPES):
             count = wound_counts[wound_type]
@@ -438,13 +2531,13 @@ class App:
                 text_surface = font.render(text, True, color)
                 
                 if col == 1:
-                    screen.blit(text_surface, (col1_x, stats_y))
+                    panel.blit(text_surface, (col1_x, stats_y))
                     col = 2
                 elif col == 2:
-                    screen.blit(text_surface, (col2_x, stats_y))
+                    panel.blit(text_surface, (col2_x, stats_y))
                     col = 3
                 else:
-                    screen.blit(text_surface, (col3_x, stats_y))
+                    panel.blit(text_surface, (col3_x, stats_y))
                     col = 1
                     stats_y += 30
                 
@@ -453,8 +2546,74 @@ class App:
                     stats_y += 30
         
         # Draw total wounds
-        total_text = font.render(f"TOTAL TRAUMAS: {len(self.wounds)}", True, NEON_YELLOW)
-        screen.blit(total_text, (self.diagram_width + 30, stats_panel_y + stats_panel_height - 30))
+        total_text = font.render(f"TOTAL TRAUMAS: {total}", True, NEON_YELLOW)
+        panel.blit(total_text, (10, stats_panel_height - 30))
+        
+        return panel
+        
+    def draw_cyberpunk_ui(self):
+        prof = self.profiler
+        
+        # Draw the pre-rendered background, grid and headers
+        screen.blit(self.background, (0, 0))
+        if prof:
+            prof.mark("background")
+        
+        # Draw the current diagram
+        screen.blit(self.diagram_images[self.current_diagram], (0, 0))
+        if prof:
+            prof.mark("diagram")
+        
+        # Draw wounds
+        screen.blit(self.wound_layer, (0, 0), special_flags=pygame.BLEND_PREMULTIPLIED)
+        
+        # Draw the heatmap overlay, built in the background for each diagram
+        if self.show_heatmap and self.heatmap_surface is not None:
+            screen.blit(self.heatmap_surface, (0, 0))
+        if prof:
+            prof.mark("wounds")
+            
+        # Draw buttons
+        for button in self.diagram_buttons:
+            button.draw(screen)
+        self.archive_button.draw(screen)
+        self.sessions_button.draw(screen)
+        self.paint_button.draw(screen)
+        self.heatmap_button.draw(screen)
+            
+        for button in self.wound_buttons:
+            button.draw(screen)
+            
+        self.clear_button.draw(screen)
+        self.save_button.draw(screen)
+        self.load_button.draw(screen)
+        self.erase_button.draw(screen)
+        self.size_up_button.draw(screen)
+        self.size_down_button.draw(screen)
+        self.fullscreen_button.draw(screen)
+        if prof:
+            prof.mark("buttons")
+        
+        # Draw wound size
+        size_text = text_cache.render(font, f"TRAUMA SIZE: {self.wound_size}", NEON_GREEN)
+        size_text_x, size_text_y = self.size_text_pos
+        screen.blit(size_text, (size_text_x, size_text_y))
+        
+        # Draw the I/O status line
+        status_text = text_cache.render(small_font, self.status, NEON_GREEN)
+        screen.blit(status_text, (size_text_x, size_text_y + 28))
+        
+        # Draw wound statistics or the session archive, re-rendered only
+        # when what they show changes
+        if self.browsing:
+            stats_key = ("sessions", self.session_scroll, self.session_list)
+            if stats_key != self.stats_key:
+                self.stats_surface = self.render_sessions_panel()
+                self.stats_key = stats_key
+        elif self.wounds.stats.version != self.stats_key:
+            self.stats_surface = self.render_stats_panel(self.wounds.count_by_type(), self.wounds.stats.total)
+            self.stats_key = self.wounds.stats.version
+        screen.blit(self.stats_surface, self.stats_panel_rect.topleft)
         
         # Draw instructions in a cyberpunk terminal style
         instructions = [
@@ -466,98 +2625,134 @@ class App:
             "> SAVE/LOAD ANALYSIS DATA"
         ]
         
-        instructions_y = stats_panel_y + stats_panel_height + 20
+        instructions_y = self.stats_panel_rect.bottom + 20
         for i, instruction in enumerate(instructions):
             color = NEON_GREEN if i == 0 else TEXT_COLOR
-            text_surface = small_font.render(instruction, True, color)
+            text_surface = text_cache.render(small_font, instruction, color)
             screen.blit(text_surface, (self.diagram_width + 30, instructions_y))
             instructions_y += 25
+        if prof:
+            prof.mark("text")
             
+    def draw_scan_line(self):
         # Draw cyberpunk-style scan lines
-        scan_line = pygame.Surface((SCREEN_WIDTH, 1), pygame.SRCALPHA)
-        scan_line.fill((NEON_BLUE[0], NEON_BLUE[1], NEON_BLUE[2], 30))
-        scan_y = pygame.time.get_ticks() // 10 % SCREEN_HEIGHT
-        screen.blit(scan_line, (0, scan_y))
+        if self.scan_y is not None:
+            screen.blit(self.scan_line, (0, self.scan_y))
+            
+    def render_frame(self):
+        # Redraw only what changed and present just those areas
+        prof = self.profiler
+        if self.show_heatmap and self.heatmap_diagram != self.current_diagram:
+            self.request_heatmap()
+        if self.show_hud:
+            # The HUD changes every frame
+            self.mark_dirty(self.hud_rect)
+        if not self.low_power:
+            scan_y = pygame.time.get_ticks() // 10 % SCREEN_HEIGHT
+            if scan_y != self.scan_y:
+                if self.scan_y is not None:
+                    self.mark_dirty((0, self.scan_y, SCREEN_WIDTH, 1))
+                self.mark_dirty((0, scan_y, SCREEN_WIDTH, 1))
+                self.scan_y = scan_y
+        
+        if self.full_redraw:
+            self.draw_cyberpunk_ui()
+            self.draw_scan_line()
+            if self.show_hud:
+                self.draw_hud()
+                if prof:
+                    prof.mark("hud")
+            pygame.display.flip()
+        elif self.dirty_rects:
+            # Many small areas are cheaper to redraw as one
+            rects = self.dirty_rects if len(self.dirty_rects) <= 8 else [self.dirty_rects[0].unionall(self.dirty_rects[1:])]
+            for rect in rects:
+                screen.set_clip(rect)
+                self.draw_cyberpunk_ui()
+                self.draw_scan_line()
+            screen.set_clip(None)
+            if self.show_hud:
+                self.draw_hud()
+                if prof:
+                    prof.mark("hud")
+            pygame.display.update(rects)
+        if prof:
+            prof.mark("present")
+        self.full_redraw = False
+        self.dirty_rects = []
         
     def run(self):
         running = True
         clock = pygame.time.Clock()
         
         while running:
-            mouse_pos = pygame.mouse.get_pos()
+            prof = self.profiler
+            if prof:
+                prof.begin_frame()
             
-            for event in pygame.event.get():
+            if self.low_power and not self.full_redraw and not self.dirty_rects:
+                # Nothing is animating: sleep until there is input
+                events = [pygame.event.wait()] + pygame.event.get()
+                if prof:
+                    prof.mark("idle")
+            else:
+                events = pygame.event.get()
+            
+            # Mouse motion is coalesced: collected here and handled in one
+            # go, before the next button event or at the end of the frame
+            motion = []
+            for event in events:
+                if event.type == pygame.MOUSEMOTION:
+                    motion.append(event.pos)
+                    continue
+                if event.type in (pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP):
+                    self.handle_motion(motion)
+                    motion = []
+                    
                 if event.type == pygame.QUIT:
-                    # Save data before quitting
-                    save_data(self.current_diagram, self.wounds)
+                    # Data is saved by flush_io once the loop ends
                     running = False
-                    
-                # Check diagram selection buttons
-                for i, button in enumerate(self.diagram_buttons):
-                    if button.is_clicked(mouse_pos, event):
-                        self.current_diagram = list(DIAGRAMS.keys())[i]
-                
-                # Check wound type selection buttons
-                for i, button in enumerate(self.wound_buttons):
-                    if button.is_clicked(mouse_pos, event):
-                        self.selected_wound_type = list(WOUND_TYPES.keys())[i]
-                
-                # Check control buttons
-                if self.clear_button.is_clicked(mouse_pos, event):
-                    self.wounds = []
-                
-                if self.save_button.is_clicked(mouse_pos, event):
-                    save_data(self.current_diagram, self.wounds)
-                
-                if self.load_button.is_clicked(mouse_pos, event):
-                    saved_diagram, saved_wounds = load_data()
-                    if saved_diagram:
-                        self.current_diagram = saved_diagram
-                        self.wounds = saved_wounds
-                
-                # Check erase button
-                if self.erase_button.is_clicked(mouse_pos, event):
-                    self.erase_mode = not self.erase_mode
-                    self.erase_button.text = f"ERASE: {'ON' if self.erase_mode else 'OFF'}"
-                
-                # Check size buttons
-                if self.size_up_button.is_clicked(mouse_pos, event):
-                    self.wound_size = min(80, self.wound_size + 5)
-                if self.size_down_button.is_clicked(mouse_pos, event):
-                    self.wound_size = max(20, self.wound_size - 5)
-                
-                # Check fullscreen button
-                if self.fullscreen_button.is_clicked(mouse_pos, event):
-                    self.toggle_fullscreen()
-                
-                # Add or remove wounds
-                if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-                    # Check if click is on the diagram area
-                    if mouse_pos[0] < self.diagram_width:
-                        if self.erase_mode:
-                            # Remove wounds that are clicked on
-                            self.wounds = [wound for wound in self.wounds 
-                                         if not (abs(wound.position[0] - mouse_pos[0]) < wound.size + 5 and
-                                                 abs(wound.position[1] - mouse_pos[1]) < wound.size + 5)]
-                        else:
-                            # Add a new wound
-                            self.wounds.append(Wound(self.selected_wound_type, mouse_pos, self.wound_size))
-            
-            # Update button hover states
-            all_buttons = (self.diagram_buttons + self.wound_buttons + 
-                          [self.clear_button, self.save_button, self.load_button,
-                           self.erase_button, self.size_up_button, self.size_down_button,
-                           self.fullscreen_button])
-            
-            for button in all_buttons:
-                button.check_hover(mouse_pos)
+                elif event.type == IO_DONE_EVENT:
+                    self.handle_io_done(event)
+                elif event.type == SYNC_EVENT:
+                    self.handle_sync(event.message)
+                elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                    entry = self.router.dispatch_click(event.pos)
+                    if entry is not None and entry[2] is not None:
+                        self.mark_button_dirty(entry[2])
+                elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
+                    self.end_stroke()
+                elif event.type == pygame.WINDOWFOCUSLOST:
+                    self.end_stroke()
+                elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                    self.mark_dirty()
+                elif event.type == pygame.MOUSEWHEEL and self.browsing:
+                    if self.stats_panel_rect.collidepoint(pygame.mouse.get_pos()):
+                        self.scroll_sessions(-event.y)
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                    self.toggle_hud()
+                elif event.type == pygame.KEYDOWN and event.mod & pygame.KMOD_CTRL and not self.sync_client:
+                    # Ctrl+Z undoes; Ctrl+Y and Ctrl+Shift+Z redo
+                    if event.key == pygame.K_y or (event.key == pygame.K_z and event.mod & pygame.KMOD_SHIFT):
+                        self.redo()
+                    elif event.key == pygame.K_z:
+                        self.undo()
+            self.handle_motion(motion)
+            if self.sync_server:
+                self.flush_sync()
+            if prof:
+                prof.mark("events")
             
             # Draw the cyberpunk UI
-            self.draw_cyberpunk_ui()
-            
-            pygame.display.flip()
-            clock.tick(60)
+            self.render_frame()
+            clock.tick(self.fps_cap)
+            if prof:
+                prof.mark("idle")
+                prof.end_frame()
         
+        if self.profiler:
+            self.profiler.close()
+        self.flush_io()
         pygame.quit()
         sys.exit()
     
@@ -576,11 +2771,83 @@ class App:
         self.diagram_width = 800 if not self.fullscreen else int(SCREEN_WIDTH * 0.6)
         self.ui_panel_width = SCREEN_WIDTH - self.diagram_width
         self.create_ui_elements()
+        self.background = self.render_background()
+        self.create_wound_layer()
+        self.scan_line = pygame.Surface((SCREEN_WIDTH, 1), pygame.SRCALPHA)
+        self.scan_line.fill((NEON_BLUE[0], NEON_BLUE[1], NEON_BLUE[2], 30))
+        self.scan_y = None
+        self.mark_dirty()
         
-        # Scale diagram images to new size
-        for name, img in self.diagram_images.items():
-            self.diagram_images[name] = pygame.transform.scale(img, (self.diagram_width, SCREEN_HEIGHT))
+        # Diagram images at the new size are scaled once from the sources and
+        # kept, so switching back and forth is a lookup
+        self.diagram_images = self.diagram_images.resized((self.diagram_width, SCREEN_HEIGHT), self.current_diagram)
 
 if __name__ == "__main__":
-    app = App()
+    parser = argparse.ArgumentParser(description="CYBER-AUTOPSY // TraumaScan")
+    parser.add_argument("--convert", nargs=2, metavar=("SOURCE", "TARGET"),
+                        help=f"convert a session between JSON and binary ({BINARY_EXTENSION}) files and exit")
+    parser.add_argument("--data", metavar="FILE", default=DATA_FILE,
+                        help=f"session file for SAVE and LOAD (default {DATA_FILE}); "
+                             f"a {BINARY_EXTENSION} extension uses the binary format")
+    parser.add_argument("--fps", type=int, default=FPS_CAP,
+                        help=f"frame rate cap (default {FPS_CAP})")
+    parser.add_argument("--low-power", action="store_true",
+                        help="stop the scan line animation and only redraw on input")
+    parser.add_argument("--profile", action="store_true",
+                        help="start with the frame profiler HUD shown (toggle with F3)")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="write per-phase frame timings to FILE (.json for Chrome trace format, otherwise CSV)")
+    parser.add_argument("--history-mb", type=float, default=HISTORY_MEMORY_CAP / (1024 * 1024),
+                        help="memory cap of the undo history in megabytes (default %(default)g)")
+    sync = parser.add_mutually_exclusive_group()
+    sync.add_argument("--serve", nargs="?", const=str(SYNC_PORT), metavar="[HOST:]PORT",
+                      help=f"share the session live with viewers on the local network (default port {SYNC_PORT})")
+    sync.add_argument("--connect", metavar="HOST[:PORT]",
+                      help="watch the session of a host started with --serve")
+    parser.add_argument("--archive", nargs="+", metavar="FILE",
+                        help=f"import session files into the session archive ({SESSION_DB}) and exit")
+    parser.add_argument("--report", nargs="?", const="GUNSHOT WOUND", metavar="WOUND_TYPE",
+                        help="print per-session counts of a wound type (default GUNSHOT WOUND) "
+                             "and the most-hit regions from the session archive, then exit")
+    args = parser.parse_args()
+    
+    if args.convert:
+        convert_session(*args.convert)
+        sys.exit()
+    
+    if args.archive or args.report:
+        store = SessionStore()
+        failures = 0
+        for path in args.archive or ():
+            try:
+                diagram, wounds, _ = read_session(path)
+                if diagram not in DIAGRAMS:
+                    # Same as the app, which treats a missing diagram as no session
+                    print(f"Skipping {path}: no known diagram ({diagram})")
+                    continue
+                name = store.save(os.path.splitext(os.path.basename(path))[0], diagram, wounds)
+            except Exception as e:
+                failures += 1
+                print(f"Error archiving {path}: {e}")
+                continue
+            print(f"Archived {path} as {name} ({len(wounds)} traumas)")
+        if args.report:
+            print(f"{args.report} per session:")
+            for name, count in store.type_counts(args.report):
+                print(f"  {name:<30}{count:>8}")
+            # Regions are only comparable within one diagram
+            for diagram in DIAGRAMS:
+                regions = store.region_counts(diagram)
+                if regions:
+                    print(f"Most-hit regions on {diagram}:")
+                    for region, count in regions:
+                        print(f"  {region:<30}{count:>8}")
+        store.close()
+        sys.exit(1 if failures else 0)
+    
+    app = App(fps_cap=args.fps, low_power=args.low_power, profile=args.profile, trace_path=args.trace,
+              history_cap=int(args.history_mb * 1024 * 1024),
+              serve=parse_address(args.serve, "0.0.0.0") if args.serve else None,
+              connect=parse_address(args.connect, "localhost") if args.connect else None,
+              data_file=args.data)
     app.run()
\ No newline at end of file
@@ -0,0 +1,94 @@
+import os
+import sys
+import glob
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Render without a window; this has to happen before main initializes pygame
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+import main
+
+# Assets loaded once per worker process by init_worker
+diagram_images = None
+wound_images = None
+
+def init_worker():
+    global diagram_images, wound_images
+    diagram_images, wound_images = main.load_images()
+
+# Function to render one session's diagram and marks to a PNG
+def render_session(path, output_dir):
+    try:
+        diagram, wounds, _ = main.read_session(path)
+        image = diagram_images.get(diagram) or diagram_images[next(iter(main.DIAGRAMS))]
+
+        canvas = pygame.Surface(image.get_size(), 0, 32)
+        canvas.fill(main.DARK_GRAY)
+        canvas.blit(image, (0, 0))
+        for wound in wounds:
+            wound.draw(canvas, wound_images)
+
+        output_path = os.path.join(output_dir, output_name(path))
+        pygame.image.save(canvas, output_path)
+        return path, output_path, None
+    except Exception as e:
+        return path, None, str(e)
+
+# Function to name a session's PNG after its file name, extension included,
+# so a.json and a.autopsy render to different files
+def output_name(path):
+    return os.path.basename(path) + ".png"
+
+# Function to expand directories into the session files they contain
+def find_sessions(paths):
+    sessions = []
+    for path in paths:
+        if os.path.isdir(path):
+            for pattern in ("*.json", "*" + main.BINARY_EXTENSION):
+                sessions.extend(sorted(glob.glob(os.path.join(path, pattern))))
+        else:
+            sessions.append(path)
+    return sessions
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Render saved autopsy sessions to PNG without opening a window")
+    parser.add_argument("sessions", nargs="+", help="session files (.json or .autopsy) or directories of them")
+    parser.add_argument("-o", "--output", default=".", help="directory for the PNG files (default: current directory)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(),
+                        help="worker processes (default: one per core)")
+    args = parser.parse_args()
+
+    sessions = find_sessions(args.sessions)
+    if not sessions:
+        print("No session files found")
+        return 1
+    os.makedirs(args.output, exist_ok=True)
+
+    # Files of the same name in different directories would overwrite each
+    # other's PNG; only the first one is rendered
+    failures = 0
+    rendered = {}
+    for path in sessions:
+        first = rendered.setdefault(output_name(path), path)
+        if first != path:
+            failures += 1
+            print(f"Skipping {path}: same output name as {first}")
+    sessions = list(rendered.values())
+
+    with ProcessPoolExecutor(max_workers=min(args.jobs, len(sessions)), initializer=init_worker,
+                             mp_context=multiprocessing.get_context("spawn")) as pool:
+        for path, output_path, error in pool.map(render_session, sessions, [args.output] * len(sessions)):
+            if error:
+                failures += 1
+                print(f"Error rendering {path}: {error}")
+            else:
+                print(f"{path} -> {output_path}")
+
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,108 @@
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+# Run the host and its viewers without a window; this has to happen before main initializes pygame
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+import main
+
+# Function to make one random change on the host, as a user would
+def random_change(host, rng):
+    wound_types = list(main.WOUND_TYPES)
+    roll = rng.random()
+    if roll < 0.45:
+        position = (rng.randrange(host.diagram_width), rng.randrange(main.SCREEN_HEIGHT))
+        size = rng.randrange(main.MIN_WOUND_SIZE, main.MAX_WOUND_SIZE + 1, main.WOUND_SIZE_STEP)
+        host.add_wound(main.Wound(rng.choice(wound_types), position, size))
+    elif roll < 0.65 and len(host.wounds):
+        row = rng.randrange(len(host.wounds))
+        host.erase_at(host.wounds.record(row)[1:3])
+    elif roll < 0.8:
+        host.undo()
+    elif roll < 0.88:
+        host.redo()
+    elif roll < 0.92:
+        host.clear_wounds()
+    elif roll < 0.97:
+        host.select_diagram(rng.choice(list(main.DIAGRAMS)))
+    else:
+        wounds = main.WoundStore((rng.choice(wound_types), rng.randrange(host.diagram_width),
+                                  rng.randrange(main.SCREEN_HEIGHT), 40) for _ in range(rng.randrange(8)))
+        host.apply_loaded(rng.choice(list(main.DIAGRAMS)), wounds)
+
+# Function to make changes on the host, publishing them every few changes
+# the way the frame loop does once per frame
+def run_changes(host, rng, count):
+    for i in range(count):
+        random_change(host, rng)
+        if rng.random() < 0.3:
+            host.flush_sync()
+    # Finish with a clear and an undo; undoing the clear itself would resend
+    # the whole session and hide a lost change
+    host.clear_wounds()
+    host.add_wound(main.Wound(rng.choice(list(main.WOUND_TYPES)), (100, 100), 40))
+    host.flush_sync()
+    host.undo()
+    host.flush_sync()
+
+# Function to apply what the viewer received until it matches the host or
+# the timeout runs out; returns whether it converged
+def converge(host, viewer, timeout):
+    expected = (host.current_diagram, host.wounds.records())
+    deadline = time.perf_counter() + timeout
+    while (viewer.current_diagram, viewer.wounds.records()) != expected:
+        if time.perf_counter() > deadline:
+            return False
+        for event in pygame.event.get(main.SYNC_EVENT):
+            viewer.handle_sync(event.message)
+        time.sleep(0.01)
+    # The incrementally redrawn wound layer must match a full redraw
+    layer = pygame.image.tobytes(viewer.wound_layer, "RGBA")
+    viewer.redraw_wound_layer()
+    return layer == pygame.image.tobytes(viewer.wound_layer, "RGBA")
+
+def check(name, ok):
+    print(f"{name:<24}{'ok' if ok else 'MISMATCH'}")
+    return ok
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Check that live sync viewers converge with their host over 127.0.0.1")
+    parser.add_argument("--changes", type=int, default=300, help="random changes per phase (default %(default)s)")
+    parser.add_argument("--seed", type=int, default=2077, help="random seed (default %(default)s)")
+    parser.add_argument("--timeout", type=float, default=5.0, help="seconds a viewer gets to catch up")
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # Keep the check away from the real session and its journal
+        main.DATA_FILE = os.path.join(workdir, "autopsy_data.json")
+        main.USE_JOURNAL = False
+        host = main.App(serve=("127.0.0.1", 0))
+        address = ("127.0.0.1", host.sync_server.port)
+        run_changes(host, rng, args.changes // 3)
+
+        # A viewer joins, gets the snapshot, then follows the changes
+        viewer = main.App(connect=address)
+        results = [check("snapshot", converge(host, viewer, args.timeout))]
+        run_changes(host, rng, args.changes)
+        results.append(check("changes", converge(host, viewer, args.timeout)))
+        viewer.flush_io()
+
+        # A late joiner gets the session the server kept up to date
+        late = main.App(connect=address)
+        results.append(check("late snapshot", converge(host, late, args.timeout)))
+        run_changes(host, rng, args.changes)
+        results.append(check("late changes", converge(host, late, args.timeout)))
+        late.flush_io()
+        host.flush_io()
+
+    return 0 if all(results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main_cli())